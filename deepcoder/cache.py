@@ -0,0 +1,91 @@
+"""On-disk cache of search results keyed by the examples of a problem.
+
+Results are keyed by the examples, T and the search. A solution answers every
+search of the same examples and T, but its steps only answer the search that found
+it. Failures depend on the search and store the gas they were given. A failure
+answers any later run of its search with as much gas or less, and a failure of a
+search that ran out of programs answers every later run of it.
+"""
+import hashlib
+import json
+import sqlite3
+
+import numpy as np
+
+def get_examples_key(examples, T):
+    """Returns a hash of examples and T that doesn't depend on the example order.
+
+    Args:
+        examples: list of tuples of (inputs, output)
+        T: max program length
+    """
+    rows = sorted(json.dumps([[x.val for x in inputs], output.val])
+        for inputs, output in examples)
+    return hashlib.sha1(json.dumps([T, rows]).encode()).hexdigest()
+
+def get_search_key(mode, predictions, beam_width=None):
+    """Returns a hash of the search mode, its parameters and the function scores
+    its context is made from."""
+    h = hashlib.sha1(json.dumps([mode, beam_width]).encode())
+    h.update(np.asarray(predictions, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+class SolutionCache(object):
+    """Search results stored in a sqlite file."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS results ('
+            'examples TEXT, search TEXT, solution TEXT, gas REAL, nb_steps TEXT, '
+            'PRIMARY KEY (examples, search))')
+        self.conn.commit()
+
+    def get(self, examples_key, search_key, gas):
+        """Returns the cached result of a search or None if it has to be run.
+
+        Returns:
+            tuple of solution prefix (None if no solution) and number of steps. the
+            number of steps is None for a solution found by another search
+        """
+        # a solution of this search first
+        row = self.conn.execute('SELECT solution, nb_steps, search = ? FROM results '
+            'WHERE examples = ? AND solution IS NOT NULL ORDER BY search = ? DESC',
+            (search_key, examples_key, search_key)).fetchone()
+        if row is not None:
+            return row[0], json.loads(row[1]) if row[2] else None
+        row = self.conn.execute('SELECT gas, nb_steps FROM results '
+            'WHERE examples = ? AND search = ?', (examples_key, search_key)).fetchone()
+        if row is not None and row[0] >= gas:
+            nb_steps = json.loads(row[1])
+            if isinstance(nb_steps, int):
+                # the search would have stopped at gas
+                nb_steps = min(nb_steps, gas)
+            return None, nb_steps
+        return None
+
+    def put(self, examples_key, search_key, gas, solution, nb_steps, exhausted=False):
+        """Stores the result of a search.
+
+        Args:
+            examples_key: see get_examples_key
+            search_key: see get_search_key. must be the key of the search that ran,
+                e.g. of parallel-dfs when a dfs problem was rerun with it, since a
+                failure only answers later runs of that search
+            gas: gas the search was given
+            solution: solution prefix or None
+            nb_steps: steps used. a list for sort-and-add
+            exhausted: True if the search failed after every program was searched,
+                so more gas wouldn't find a solution. default False
+        """
+        if solution is None and exhausted:
+            gas = np.inf
+        row = self.conn.execute('SELECT gas FROM results WHERE examples = ? AND search = ?',
+            (examples_key, search_key)).fetchone()
+        if solution is None and row is not None and row[0] >= gas:
+            return
+        self.conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+            (examples_key, search_key, solution, float(gas), json.dumps(nb_steps)))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
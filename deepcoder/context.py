@@ -1,3 +1,4 @@
+import bisect
 import collections
 
 import numpy as np
@@ -13,10 +14,36 @@ class Context(object):
         """
         self.items = sorted(scores_map.items(), key=lambda x: -x[1]) # descending
         self.scores_map = scores_map
+        self._index()
 
+    def _index(self):
         self.functions = [f for f, _  in self.items if f not in LAMBDAS]
         self.typemap = collections.defaultdict(list)
         for f, _ in self.items:
             self.typemap[f.type].append(f)
 
+    def add(self, scores_map):
+        """Returns a new Context with the functions in scores_map added.
+
+        The new items are inserted into the sorted items instead of re-sorting, in
+        the same order as Context of the merged scores_map.
+
+        Arguments:
+            scores_map (dict): dict of function to score. functions must not
+                already be in this context
+        """
+        items = list(self.items)
+        keys = [-score for _, score in items]
+        for f, score in scores_map.items():
+            i = bisect.bisect_right(keys, -score)
+            keys.insert(i, -score)
+            items.insert(i, (f, score))
+
+        ctx = Context.__new__(Context)
+        ctx.items = items
+        ctx.scores_map = dict(self.scores_map)
+        ctx.scores_map.update(scores_map)
+        ctx._index()
+        return ctx
+
 DefaultContext = Context(dict(zip(FUNCTIONS, np.ones(len(FUNCTIONS)))))
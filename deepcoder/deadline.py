@@ -0,0 +1,57 @@
+import threading
+import time
+
+import numpy as np
+
+# steps between reads of the clock and the cancel event
+CHECK_INTERVAL = 64
+
+class Deadline(object):
+    """Wall-clock limit and cancellation of a search when passed as its deadline
+    argument.
+
+    The search stops at the first check after the time runs out or cancel is called,
+    and returns what it has so far as if it ran out of gas. Afterwards timed_out and
+    cancelled tell which one stopped it.
+    """
+
+    def __init__(self, timeout_ms=None, cancel_event=None):
+        """
+        Args:
+            timeout_ms: milliseconds from now the search may run. default None
+                (unlimited)
+            cancel_event: threading.Event or multiprocessing.Event that cancels the
+                search when set. default a new threading.Event
+        """
+        self.end = np.inf if timeout_ms is None else time.time() + timeout_ms / 1000.
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+        self.timed_out = False
+        self.cancelled = False
+        self.nb_checks = 0
+
+    def cancel(self):
+        """Stops the search. Safe to call from another thread."""
+        self.cancel_event.set()
+
+    def expired(self):
+        """Returns True if the search should stop.
+
+        Only every CHECK_INTERVAL-th call reads the clock so it can be called on
+        every step.
+        """
+        self.nb_checks += 1
+        if (self.nb_checks - 1) % CHECK_INTERVAL:
+            return False
+        return self.check()
+
+    def check(self):
+        """Like expired but always reads the clock."""
+        if self.cancel_event.is_set():
+            self.cancelled = True
+        elif time.time() >= self.end:
+            self.timed_out = True
+        return self.timed_out or self.cancelled
+
+    @property
+    def stopped(self):
+        return self.timed_out or self.cancelled
@@ -0,0 +1,292 @@
+"""Batched evaluation of the dsl over all examples at once.
+
+A variable's values on M examples are stored in a Batch: a zero padded
+(M, W) int array with a length vector and a null mask. Each function in
+impl has a numpy implementation that works on whole Batches so the range
+and null checks are vectorized too.
+"""
+import numpy as np
+
+from deepcoder.dsl import impl
+from deepcoder.dsl.constants import INTMIN, INTMAX
+from deepcoder.dsl.function import OutputOutOfRangeError, NullInputError
+from deepcoder.dsl.types import INT, LIST, NULLTYPE
+from deepcoder.dsl.value import Value, NULLVALUE
+
+# intermediate SCAN1L results are clipped to this so products can't overflow.
+# anything outside of [INTMIN, INTMAX] is out of range anyway.
+_CLIP = 1 << 20
+
+class Batch(object):
+    """Values of a single variable on M examples.
+
+    Attributes:
+        type (PrimitiveType): INT or LIST. NULLTYPE if every value is null
+        data (np.ndarray): (M, W) int64 array padded with zeros. ints are stored
+            in column 0
+        lengths (np.ndarray): (M,) list lengths. 1 for ints, 0 for nulls
+        null (np.ndarray): (M,) bool mask of null values
+    """
+    def __init__(self, typ, data, lengths, null=None):
+        self.type = typ
+        self.data = data
+        self.lengths = lengths
+        if null is None:
+            null = np.zeros(len(lengths), dtype=bool)
+        self.null = null
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def valid(self):
+        """Returns (M, W) bool mask of positions holding a value."""
+        mask = np.arange(self.data.shape[1]) < self.lengths[:, None]
+        return mask & ~self.null[:, None]
+
+    def __eq__(self, other):
+        if not isinstance(other, Batch):
+            return False
+        if len(self) != len(other) or not np.array_equal(self.null, other.null):
+            return False
+        if self.null.all():
+            return True
+        if self.type != other.type:
+            return False
+        if not np.array_equal(self.lengths, other.lengths):
+            return False
+        width = max(self.data.shape[1], other.data.shape[1])
+        return np.array_equal(_pad(self.data, width), _pad(other.data, width))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(self.to_values())
+
+    @classmethod
+    def from_values(cls, values):
+        """Constructs a Batch from a list of Value (one per example)."""
+        typ = NULLTYPE
+        for value in values:
+            if value != NULLVALUE:
+                typ = value.type
+                break
+
+        lengths = np.zeros(len(values), dtype=np.int64)
+        null = np.zeros(len(values), dtype=bool)
+        raws = []
+        for i, value in enumerate(values):
+            if value == NULLVALUE:
+                null[i] = True
+                raws.append([])
+            elif value.type == INT:
+                raws.append([value.val])
+            else:
+                raws.append(value.val)
+            lengths[i] = len(raws[-1])
+
+        data = np.zeros((len(values), max(1, lengths.max(initial=0))), dtype=np.int64)
+        for i, raw in enumerate(raws):
+            data[i, :len(raw)] = raw
+        return cls(typ, data, lengths, null)
+
+    def to_values(self):
+        """Returns list of Value (one per example)."""
+        values = []
+        for i in range(len(self)):
+            if self.null[i]:
+                values.append(NULLVALUE)
+            elif self.type == INT:
+                values.append(Value.construct(int(self.data[i, 0]), INT))
+            else:
+                values.append(Value.construct(self.data[i, :self.lengths[i]].tolist(), LIST))
+        return values
+
+def _pad(data, width):
+    if data.shape[1] >= width:
+        return data
+    return np.pad(data, ((0, 0), (0, width - data.shape[1])))
+
+def _int_batch(vals, null=None):
+    vals = np.where(null, 0, vals) if null is not None else vals
+    lengths = np.ones(len(vals), dtype=np.int64)
+    if null is not None:
+        lengths[null] = 0
+    return Batch(INT, vals.astype(np.int64)[:, None], lengths, null)
+
+def _list_batch(data, lengths):
+    """Zeros out padding so equal lists have equal rows."""
+    if data.shape[1] == 0:
+        data = np.zeros((len(lengths), 1), dtype=np.int64)
+    mask = np.arange(data.shape[1]) < lengths[:, None]
+    return Batch(LIST, np.where(mask, data, 0).astype(np.int64), lengths.astype(np.int64))
+
+def _gather(xs, starts, lengths):
+    """Returns rows of xs.data from starts with the given lengths."""
+    width = xs.data.shape[1]
+    idx = starts[:, None] + np.arange(width)
+    data = np.take_along_axis(xs.data, np.clip(idx, 0, width - 1), axis=1)
+    return _list_batch(data, lengths)
+
+def _divide(x, k):
+    # python int(x / k) truncates toward zero
+    return np.sign(x) * (np.abs(x) // k)
+
+LAMBDA_IMPLS = {
+    impl.PLUS1: lambda x: x + 1,
+    impl.MINUS1: lambda x: x - 1,
+    impl.TIMES2: lambda x: x * 2,
+    impl.DIV2: lambda x: _divide(x, 2),
+    impl.TIMESNEG1: lambda x: -x,
+    impl.POW2: lambda x: x ** 2,
+    impl.TIMES3: lambda x: x * 3,
+    impl.DIV3: lambda x: _divide(x, 3),
+    impl.TIMES4: lambda x: x * 4,
+    impl.DIV4: lambda x: _divide(x, 4),
+
+    impl.GT0: lambda x: x > 0,
+    impl.LT0: lambda x: x < 0,
+    impl.EVEN: lambda x: x % 2 == 0,
+    impl.ODD: lambda x: x % 2 == 1,
+
+    impl.LPLUS: np.add,
+    impl.LMINUS: np.subtract,
+    impl.LTIMES: np.multiply,
+    impl.LMIN: np.minimum,
+    impl.LMAX: np.maximum,
+}
+
+def _head(xs):
+    return _int_batch(xs.data[:, 0], xs.lengths == 0)
+
+def _tail(xs):
+    last = np.maximum(xs.lengths - 1, 0)
+    return _int_batch(xs.data[np.arange(len(xs)), last], xs.lengths == 0)
+
+def _minimum(xs):
+    vals = np.where(xs.valid(), xs.data, np.iinfo(np.int64).max).min(axis=1)
+    return _int_batch(vals, xs.lengths == 0)
+
+def _maximum(xs):
+    vals = np.where(xs.valid(), xs.data, np.iinfo(np.int64).min).max(axis=1)
+    return _int_batch(vals, xs.lengths == 0)
+
+def _reverse(xs):
+    idx = xs.lengths[:, None] - 1 - np.arange(xs.data.shape[1])
+    data = np.take_along_axis(xs.data, np.maximum(idx, 0), axis=1)
+    return _list_batch(data, xs.lengths)
+
+def _sort(xs):
+    data = np.sort(np.where(xs.valid(), xs.data, np.iinfo(np.int64).max), axis=1)
+    return _list_batch(data, xs.lengths)
+
+def _sum(xs):
+    return _int_batch(np.where(xs.valid(), xs.data, 0).sum(axis=1))
+
+def _slice_start(n, lengths):
+    # python slicing semantics: negative n counts from the end
+    return np.where(n >= 0, np.minimum(n, lengths), np.maximum(lengths + n, 0))
+
+def _take(n, xs):
+    stop = _slice_start(n.data[:, 0], xs.lengths)
+    return _list_batch(xs.data, stop)
+
+def _drop(n, xs):
+    start = _slice_start(n.data[:, 0], xs.lengths)
+    return _gather(xs, start, xs.lengths - start)
+
+def _access(n, xs):
+    n = n.data[:, 0]
+    null = (n < 0) | (n >= xs.lengths)
+    idx = np.clip(n, 0, xs.data.shape[1] - 1)
+    return _int_batch(xs.data[np.arange(len(xs)), idx], null)
+
+def _map(f, xs):
+    return _list_batch(LAMBDA_IMPLS[f](xs.data), xs.lengths)
+
+def _keep(f, xs):
+    return LAMBDA_IMPLS[f](xs.data) & xs.valid()
+
+def _filter(f, xs):
+    keep = _keep(f, xs)
+    order = np.argsort(~keep, axis=1, kind='stable')
+    return _list_batch(np.take_along_axis(xs.data, order, axis=1), keep.sum(axis=1))
+
+def _count(f, xs):
+    return _int_batch(_keep(f, xs).sum(axis=1))
+
+def _scan1l(f, xs):
+    g = LAMBDA_IMPLS[f]
+    data = xs.data.copy()
+    for j in range(1, data.shape[1]):
+        data[:, j] = np.clip(g(data[:, j - 1], data[:, j]), -_CLIP, _CLIP)
+    return _list_batch(data, xs.lengths)
+
+def _zipwith(f, xs, ys):
+    width = min(xs.data.shape[1], ys.data.shape[1])
+    data = LAMBDA_IMPLS[f](xs.data[:, :width], ys.data[:, :width])
+    return _list_batch(data, np.minimum(xs.lengths, ys.lengths))
+
+BATCH_IMPLS = {
+    impl.HEAD: _head,
+    impl.TAIL: _tail,
+    impl.MINIMUM: _minimum,
+    impl.MAXIMUM: _maximum,
+    impl.REVERSE: _reverse,
+    impl.SORT: _sort,
+    impl.SUM: _sum,
+
+    impl.TAKE: _take,
+    impl.DROP: _drop,
+    impl.ACCESS: _access,
+
+    impl.MAP: _map,
+    impl.FILTER: _filter,
+    impl.COUNT: _count,
+    impl.SCAN1L: _scan1l,
+    impl.ZIPWITH: _zipwith,
+}
+
+def call(f, *args):
+    """Batched equivalent of Function.__call__.
+
+    Arguments:
+        f (Function): function in BATCH_IMPLS
+        args: mix of Batch and lambda Function
+
+    Returns:
+        Batch
+
+    Raises:
+        NullInputError if any argument is null on any example.
+        OutputOutOfRangeError if the output is out of range on any example.
+    """
+    for arg in args:
+        if isinstance(arg, Batch) and arg.null.any():
+            raise NullInputError('{}({})'.format(f.name, args))
+    output = BATCH_IMPLS[f](*args)
+    vals = output.data[output.valid()]
+    if vals.size and (vals.min() < INTMIN or vals.max() > INTMAX):
+        raise OutputOutOfRangeError('{}({})'.format(f.name, args))
+    return output
+
+def from_inputs(inputs_list):
+    """Returns a Batch for each input given a list of inputs for each example."""
+    return [Batch.from_values(list(x)) for x in zip(*inputs_list)]
+
+def run(program, inputs):
+    """Batched equivalent of Program.__call__.
+
+    Arguments:
+        program (Program): program to run
+        inputs (list): Batch for each program input
+
+    Returns:
+        Batch of program output
+    """
+    if not program.stmts:
+        return Batch.from_values([NULLVALUE] * len(inputs[0]))
+    vals = list(inputs)
+    for f, args in program.stmts:
+        vals.append(call(f, *[vals[x] if isinstance(x, int) else x for x in args]))
+    return vals[-1]
@@ -1,8 +1,10 @@
 
 import copy
+import hashlib
 
 import numpy as np
 
+from deepcoder.dsl import batch
 from deepcoder.dsl import impl
 from deepcoder.dsl.function import OutputOutOfRangeError, NullInputError
 from deepcoder.dsl.constants import INTMIN, INTMAX
@@ -113,6 +115,43 @@ def sample(constraint):
         ic = constraint.int_constraints[l]
         return [sample(ic) for _ in range(l)]
 
+def sample_batch(constraint, M, rng):
+    """Samples M raw values of constraint like sample but in a few calls of rng.
+
+    Arguments:
+        constraint (IntConstraint or ListConstraint): constraint to sample
+        M (int): number of values
+        rng (numpy.random.Generator): random numbers
+
+    Returns:
+        list of M ints or lists of ints
+    """
+    if not constraint.valid:
+        raise InvalidConstraintError('invalid constraint {}'.format(constraint))
+
+    if isinstance(constraint, IntConstraint):
+        if constraint.vmin == constraint.vmax:
+            return [constraint.vmin] * M
+        return rng.integers(constraint.vmin, constraint.vmax, M).tolist()
+
+    if constraint.lmin == constraint.lmax:
+        lengths = np.full(M, constraint.lmin)
+    else:
+        lengths = rng.integers(constraint.lmin, constraint.lmax, M)
+    # bounds of the elements of lists of each length. the upper bound is exclusive
+    # like in sample unless it is the lower bound
+    vmins = np.array([ic.vmin for ic in constraint.int_constraints])
+    vmaxs = np.array([max(ic.vmax, ic.vmin + 1) for ic in constraint.int_constraints])
+    vals = rng.integers(np.repeat(vmins[lengths], lengths),
+                        np.repeat(vmaxs[lengths], lengths))
+    return [x.tolist() for x in np.split(vals, np.cumsum(lengths)[:-1])]
+
+def get_program_rng(program, seed=0):
+    """Returns a numpy.random.Generator that only depends on program and seed, so
+    the examples of a program are the same whatever else is generated with it."""
+    digest = hashlib.sha256(program.prefix.encode()).digest()
+    return np.random.default_rng([seed, int.from_bytes(digest[:8], 'little')])
+
 def get_constraints_from_stmt(stmt, constraint, null_allowed=False):
     """Returns a list of constraint to apply to inputs of stmt or None which means
     no constraint imposed.
@@ -332,34 +371,51 @@ def propagate_constraints(p, output_constraint=None):
                 null_allowed[input_idx] = False
     return constraints
 
-def get_input_output_examples(program, M=5):
-    examples = []
+def get_input_output_examples(program, M=5, batched=False, rng=None):
+    """Samples M inputs satisfying the propagated constraints and runs program on them.
+
+    Arguments:
+        program (Program): program to generate examples for
+        M (int): number of examples
+        batched (bool): run program on all examples at once (see dsl.batch)
+        rng (numpy.random.Generator): random numbers (see get_program_rng). default
+            None (seeded from the global numpy random state)
+
+    Returns:
+        list of tuples of (inputs, output)
+    """
+    if rng is None:
+        rng = np.random.default_rng(np.random.randint(1 << 31))
     constraints = propagate_constraints(program)
 
-    for i in range(M):
-        input_vals = []
-        for j, (input_type, constraint) in enumerate(zip(program.input_types, constraints)):
-            raw_val = sample(constraint)
-            val = Value.construct(raw_val, input_type)
-            input_vals.append(val)
-        output_val = program(*input_vals)
-        examples.append((input_vals, output_val))
+    columns = [[Value.construct(raw_val, input_type)
+                for raw_val in sample_batch(constraint, M, rng)]
+               for input_type, constraint in zip(program.input_types, constraints)]
+    inputs_list = [list(input_vals) for input_vals in zip(*columns)]
 
-    return examples
+    if batched:
+        outputs = batch.run(program, batch.from_inputs(inputs_list)).to_values()
+    else:
+        outputs = [program(*input_vals) for input_vals in inputs_list]
+    return list(zip(inputs_list, outputs))
 
-def is_same(program, other, input_output_examples=None, M=5):
+def is_same(program, other, input_output_examples=None, M=5, batched=False):
     """input_output_examples can be passed in for speed
     (comparing same program to many others)"""
     try:
         if (program.input_types != other.input_types or
-            program.types[-1] != other.types[-1]):
+            program.output_type != other.output_type):
             return False
         if not input_output_examples:
-            input_output_examples = get_input_output_examples(program, M)
+            input_output_examples = get_input_output_examples(program, M, batched)
+        if batched:
+            inputs = batch.from_inputs([x for x, _ in input_output_examples])
+            outputs = batch.Batch.from_values([y for _, y in input_output_examples])
+            return batch.run(other, inputs) == outputs
+        run = other.compile()
         for inputs, output in input_output_examples:
-            other_output = other(*inputs)
-            if output != other_output:
+            if output.val != run(*[x.val for x in inputs]):
                 return False
         return True
     except (OutputOutOfRangeError, NullInputError):
-        return False
\ No newline at end of file
+        return False
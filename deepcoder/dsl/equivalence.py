@@ -0,0 +1,377 @@
+"""Table of dsl fragments that have a smaller equivalent.
+
+A fragment is a statement, or a statement together with the statement that makes
+one of its arguments. Its variables are numbered by their order in the program,
+so the same fragment has the same key wherever it appears. The key of a pair also
+has the variable the inner statement makes, since an outer statement like
+ZIPWITH,-,1,2 means something else when the inner statement makes 1 than when it
+makes 2. For example MAP,*2,0>1|MAP,*2,1 is MAP *2 applied to the output of MAP *2,
+which is equivalent to MAP,*4,0.
+
+Equivalent forms are a variable or a single statement over the fragment's
+variables. The table is mined offline by running fragments on sampled inputs
+(see scripts/mine-equivalences.py). Searches skip a statement if one of its
+fragments has a smaller equivalent. See RedundantStmts.
+"""
+import collections
+import itertools
+import json
+import os
+
+import numpy as np
+
+from deepcoder.dsl import constraint
+from deepcoder.dsl import impl
+from deepcoder.dsl.function import Function, OutputOutOfRangeError, NullInputError
+from deepcoder.dsl.types import INT, LIST
+
+TABLE_PATH = os.path.join(os.path.dirname(__file__), 'equivalences.json')
+
+# max number of variables in a fragment: two for the inner statement, itself and one
+# more for the outer statement
+MAX_NB_VARIABLES = 4
+
+_ORDER = {f: i for i, f in enumerate(impl.FUNCTIONS)}
+
+# stands in for an error in a fingerprint
+_ERROR = 'error'
+
+def _rank(args, ranks):
+    return tuple(ranks[x] if isinstance(x, int) else x for x in args)
+
+def get_keys(stmt, nb_inputs, stmts):
+    """Yields the keys of the fragments of stmt as the next statement of a program.
+
+    Args:
+        stmt: tuple of Function, arguments
+        nb_inputs: number of program inputs
+        stmts: statements of the program so far
+    Yields:
+        tuple of one statement (stmt,) or of two statements and the variable the
+        first one makes (inner, stmt, variable), with variables ranked
+    """
+    f, args = stmt
+    variables = [x for x in args if isinstance(x, int)]
+    ranks = {x: i for i, x in enumerate(sorted(set(variables)))}
+    yield ((f, _rank(args, ranks)),)
+    for x in ranks:
+        if x < nb_inputs:
+            continue
+        inner_f, inner_args = stmts[x - nb_inputs]
+        inner_variables = [y for y in inner_args if isinstance(y, int)]
+        inner_ranks = {y: i for i, y in enumerate(sorted(set(variables + inner_variables)))}
+        yield ((inner_f, _rank(inner_args, inner_ranks)), (f, _rank(args, inner_ranks)),
+               inner_ranks[x])
+
+def get_functions(form):
+    """Returns the set of functions and lambdas of a form."""
+    if isinstance(form, int):
+        return set()
+    f, args = form
+    return {f} | {x for x in args if isinstance(x, Function)}
+
+def _unrank(stmt, variables):
+    f, args = stmt
+    return f, tuple(variables[x] if isinstance(x, int) else x for x in args)
+
+class RedundantStmts(object):
+    """Statements a search skips, with the variables of the program filled in.
+
+    A statement is skipped if one of its fragments has an equivalent made of
+    functions in the context, or an equivalent variable that isn't a program input.
+    Inputs don't count since a program can't return one.
+
+    Checking every candidate's fragments against the table is slow, so the table is
+    turned into sets of statements once per variable that could be their inner
+    statement and cached.
+    """
+
+    def __init__(self, table, functions, nb_inputs, nb_vars):
+        """
+        Args:
+            table: dict of fragment key -> list of smaller equivalent forms
+            functions: collection of Function and lambdas available to the search
+            nb_inputs: number of program inputs
+            nb_vars: max number of variables of the programs searched
+        """
+        self.functions = set(functions)
+        self.nb_inputs = nb_inputs
+        self.nb_vars = nb_vars
+        self.first = set()
+        # (ranked inner statement, its ranked variable, number of variables) -> list
+        # of (ranked outer statement, equivalent forms)
+        self.outers = collections.defaultdict(list)
+        for key, forms in table.items():
+            if len(key) == 1:
+                stmt, = key
+                nb_variables = len(_uses(stmt))
+                for variables in itertools.combinations(range(nb_vars), nb_variables):
+                    if self._has_equivalent(forms, variables):
+                        self.first.add(_unrank(stmt, variables))
+            else:
+                inner, outer, variable = key
+                self.outers[(inner, variable, len(_uses(inner) | _uses(outer)))].append(
+                    (outer, forms))
+        self._cache = {}
+
+    def _has_equivalent(self, forms, variables):
+        for form in forms:
+            if isinstance(form, int):
+                if variables[form] >= self.nb_inputs:
+                    return True
+            elif get_functions(form) <= self.functions:
+                return True
+        return False
+
+    def get(self, stmts):
+        """Returns the set of statements to skip as the next statement after stmts."""
+        skipped = set(self.first)
+        for i, stmt in enumerate(stmts):
+            skipped |= self._get_outers(self.nb_inputs + i, stmt)
+        return skipped
+
+    def skips(self, stmts, stmt):
+        """Returns whether stmt is in get(stmts) without building the set."""
+        if stmt in self.first:
+            return True
+        return any(stmt in self._get_outers(self.nb_inputs + i, inner)
+                   for i, inner in enumerate(stmts))
+
+    def _get_outers(self, index, inner):
+        """Returns the set of statements skipped when they use the variable at index
+        made by inner."""
+        key = (index, inner)
+        if key not in self._cache:
+            skipped = set()
+            inner_variables = _uses(inner) | {index}
+            # the outer statement may use one more variable anywhere in the program
+            for extra in [None] + list(range(self.nb_vars)):
+                if extra in inner_variables:
+                    continue
+                variables = sorted(inner_variables | ({extra} if extra is not None else set()))
+                ranks = {x: i for i, x in enumerate(variables)}
+                ranked = (inner[0], _rank(inner[1], ranks))
+                for outer, forms in self.outers.get((ranked, ranks[index], len(variables)),
+                                                    []):
+                    if self._has_equivalent(forms, variables):
+                        skipped.add(_unrank(outer, variables))
+            self._cache[key] = skipped
+        return self._cache[key]
+
+def _order(form):
+    """Sort key of forms. Variables come first, then statements by the variables they
+    use from last to first. Variable ranks follow the program order, so a statement
+    is only ever replaced by one that uses earlier variables or the same variables
+    and comes before it in impl.FUNCTIONS, and a program can't be rewritten forever.
+    """
+    if isinstance(form, int):
+        return (0, form)
+    f, args = form
+    return (1, tuple(sorted(_uses(form), reverse=True)), _ORDER[f],
+        tuple(_ORDER[x] if isinstance(x, Function) else x for x in args))
+
+def _format_stmt(stmt):
+    f, args = stmt
+    return ','.join(map(str, [f] + list(args)))
+
+def _parse_stmt(tok):
+    terms = [int(x) if x.isdigit() else impl.NAME2FUNC[x] for x in tok.split(',')]
+    return terms[0], tuple(terms[1:])
+
+def format_key(key):
+    if len(key) == 1:
+        return _format_stmt(key[0])
+    inner, outer, variable = key
+    return '{}>{}|{}'.format(_format_stmt(inner), variable, _format_stmt(outer))
+
+def parse_key(tok):
+    if '|' not in tok:
+        return (_parse_stmt(tok),)
+    inner, outer = tok.split('|')
+    inner, variable = inner.rsplit('>', 1)
+    return _parse_stmt(inner), _parse_stmt(outer), int(variable)
+
+def format_form(form):
+    return str(form) if isinstance(form, int) else _format_stmt(form)
+
+def parse_form(tok):
+    return int(tok) if tok.isdigit() else _parse_stmt(tok)
+
+def save(table, path=TABLE_PATH):
+    rows = {format_key(key): [format_form(x) for x in forms] for key, forms in table.items()}
+    with open(path, 'w') as f:
+        json.dump(rows, f, indent=0, sort_keys=True)
+
+def load(path=TABLE_PATH):
+    """Returns the table saved at path. empty if there is no table."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        rows = json.load(f)
+    return {parse_key(key): [parse_form(x) for x in forms] for key, forms in rows.items()}
+
+def _iterate_stmts(functions, slot_types):
+    """Yields every statement over the variables with types slot_types."""
+    type_to_inputs = collections.defaultdict(list)
+    for i, typ in enumerate(slot_types):
+        type_to_inputs[typ].append(i)
+    for f in functions:
+        if f in impl.LAMBDAS:
+            type_to_inputs[f.type].append(f)
+    for f in functions:
+        if f in impl.LAMBDAS:
+            continue
+        argslists = [type_to_inputs[x] for x in f.type.input_types]
+        for args in itertools.product(*argslists):
+            yield f, args
+
+def _sample(typ):
+    """Returns a raw value of typ. lists are tuples so fingerprints can be hashed."""
+    # a third of the samples are short lists and small non-negative ints so ints can
+    # be indices into lists, and a third are small so products and sums stay in range
+    r = np.random.rand()
+    if r < 1 / 3:
+        ic = constraint.IntConstraint(0, 5)
+        lmax = 6
+    else:
+        ic = constraint.IntConstraint(-5, 6) if r < 2 / 3 else constraint.IntConstraint()
+        lmax = constraint.L
+    if typ == INT:
+        return constraint.sample(ic)
+    lc = constraint.ListConstraint(0, lmax,
+        [constraint.IntConstraint(ic.vmin, ic.vmax) for _ in range(constraint.L + 1)])
+    return tuple(constraint.sample(lc))
+
+def _run(stmt, vals):
+    f, args = stmt
+    try:
+        output = f.call_raw(*[vals[x] if isinstance(x, int) else x.val for x in args])
+    except (NullInputError, OutputOutOfRangeError):
+        return _ERROR
+    return tuple(output) if isinstance(output, list) else output
+
+def _add_class(forms, is_fragment, statements=()):
+    """Yields each fragment of an equivalence class with the forms before it.
+
+    Args:
+        forms: list of equivalent variables and statements
+        is_fragment: function of a form to whether it is a fragment
+        statements: variables that are always statements
+    """
+    forms = sorted(forms, key=_order)
+    for i, form in enumerate(forms):
+        if not is_fragment(form) or not i:
+            continue
+        # keep the smallest variable and the smallest statement for each set of
+        # functions needed. statements that only need the fragment's own functions
+        # are always in the context
+        functions = get_functions(form)
+        equivalents = []
+        for other in forms[:i]:
+            if isinstance(other, int):
+                if other in statements:
+                    equivalents = [other]
+                    break
+                if not equivalents:
+                    equivalents.append(other)
+                continue
+            if any(not isinstance(x, int) and get_functions(x) <= get_functions(other)
+                    for x in equivalents):
+                continue
+            equivalents.append(other)
+            if get_functions(other) <= functions:
+                break
+        yield form, equivalents
+
+def _classes(stmts, fingerprints, nb_slots):
+    """Groups the slots and statements by fingerprint.
+
+    Statements that are null or raise on every sample aren't grouped. They may only
+    agree because no sample was one they are defined on.
+    """
+    classes = collections.defaultdict(list)
+    for i in range(nb_slots):
+        classes[fingerprints[i]].append(i)
+    for stmt in stmts:
+        classes[fingerprints[stmt]].append(stmt)
+    return [forms for fingerprint, forms in classes.items()
+            if any(x not in (None, _ERROR) for x in fingerprint)]
+
+def _uses(stmt):
+    return {x for x in stmt[1] if isinstance(x, int)}
+
+def mine(functions=impl.FUNCTIONS, nb_samples=100, seed=0):
+    """Finds fragments with smaller equivalents by running them on sampled inputs.
+
+    Two forms are equivalent if they have the same output or both raise on every
+    sample, and are not null or raise on at least one sample. Samples where the inner statement of a fragment is null or raises are
+    skipped since the search never makes a fragment there.
+
+    Args:
+        functions: list of Function and lambdas to use
+        nb_samples: number of sampled inputs for each set of variable types
+        seed: random seed
+    Returns:
+        dict of fragment key -> list of smaller equivalent forms
+    """
+    np.random.seed(seed)
+    functions = list(functions)
+    table = {}
+
+    for nb_slots in range(1, MAX_NB_VARIABLES + 1):
+        for slot_types in itertools.product([INT, LIST], repeat=nb_slots):
+            samples = [[_sample(x) for x in slot_types] for _ in range(nb_samples)]
+            stmts = list(_iterate_stmts(functions, slot_types))
+            fingerprints = {i: tuple(vals[i] for vals in samples) for i in range(nb_slots)}
+            for stmt in stmts:
+                fingerprints[stmt] = tuple(_run(stmt, vals) for vals in samples)
+
+            # single statements that use every variable
+            if nb_slots <= 2:
+                for forms in _classes(stmts, fingerprints, nb_slots):
+                    for form, equivalents in _add_class(forms,
+                            lambda x: not isinstance(x, int) and len(_uses(x)) == nb_slots):
+                        table[(form,)] = equivalents
+
+            # the variable at slot p is made by an inner statement over earlier slots
+            for p in range(1, nb_slots):
+                for inner in stmts:
+                    inner_uses = _uses(inner)
+                    if inner[0].output_type != slot_types[p] or max(inner_uses) >= p:
+                        continue
+                    # the outer statement uses the inner one and at most one more slot
+                    if nb_slots - len(inner_uses) - 1 > MAX_NB_VARIABLES - 3:
+                        continue
+                    rows = [vals[:p] + [_run(inner, vals)] + vals[p + 1:] for vals in samples]
+                    valid = [i for i, vals in enumerate(rows) if vals[p] not in (None, _ERROR)]
+                    if len(valid) < nb_samples // 4:
+                        continue
+                    rows = [rows[i] for i in valid]
+                    fps = {i: tuple(vals[i] for vals in rows) for i in range(nb_slots)}
+                    for stmt in stmts:
+                        if p in _uses(stmt):
+                            fps[stmt] = tuple(_run(stmt, vals) for vals in rows)
+                        else:
+                            fps[stmt] = tuple(fingerprints[stmt][i] for i in valid)
+
+                    def is_fragment(form):
+                        if isinstance(form, int):
+                            return False
+                        uses = _uses(form)
+                        return p in uses and len(uses | inner_uses) == nb_slots
+
+                    for forms in _classes(stmts, fps, nb_slots):
+                        for form, equivalents in _add_class(forms, is_fragment, {p}):
+                            table[(inner, form, p)] = equivalents
+
+    # drop fragments with a statement that is always skipped on its own
+    def always_skipped(stmt):
+        forms = table.get(next(get_keys(stmt, 0, ())), [])
+        return any(not isinstance(x, int) and get_functions(x) <= get_functions(stmt)
+            for x in forms)
+
+    for key in list(table):
+        if len(key) == 3 and (always_skipped(key[0]) or always_skipped(key[1])):
+            del table[key]
+
+    return table
@@ -0,0 +1,83 @@
+"""Fingerprints of what programs do on a fixed bank of inputs.
+
+Every program with the same input types is run on the same inputs, so programs that
+behave the same have the same fingerprint. Programs that share a fingerprint are
+only candidates: they may still differ on inputs outside the bank.
+"""
+import collections
+import functools
+import hashlib
+
+import numpy as np
+
+from deepcoder.dsl import constraint
+from deepcoder.dsl.function import OutputOutOfRangeError, NullInputError
+from deepcoder.dsl.types import INT
+
+# number of inputs in the bank of each input types
+NB_BANK_INPUTS = 32
+# values in the bank are in [-VMAX, VMAX]
+VMAX = 8
+
+# stands in for an error in a fingerprint
+_ERROR = 'error'
+
+@functools.lru_cache(maxsize=None)
+def get_input_bank(input_types, nb_inputs=NB_BANK_INPUTS, seed=0):
+    """Returns the bank of inputs of programs with input_types.
+
+    Values are small so that programs which compute the same thing in a different
+    order, like FILTER then MAP *2 and MAP *2 then FILTER, don't differ by one of
+    them going out of range. Lists have from 0 to constraint.L elements.
+
+    Args:
+        input_types: tuple of Type
+    Returns:
+        tuple of tuples of raw inputs
+    """
+    rng = np.random.RandomState(seed)
+    bank = []
+    for _ in range(nb_inputs):
+        inputs = []
+        for input_type in input_types:
+            if input_type == INT:
+                inputs.append(int(rng.randint(-VMAX, VMAX + 1)))
+            else:
+                length = rng.randint(0, constraint.L + 1)
+                inputs.append([int(x) for x in rng.randint(-VMAX, VMAX + 1, length)])
+        bank.append(tuple(inputs))
+    return tuple(bank)
+
+def get_fingerprint(program):
+    """Returns a digest of the outputs of program on the bank of its input types."""
+    run = program.compile()
+    outputs = []
+    for inputs in get_input_bank(program.input_types):
+        try:
+            outputs.append(run(*inputs))
+        except (NullInputError, OutputOutOfRangeError):
+            outputs.append(_ERROR)
+    return hashlib.blake2b(repr(outputs).encode(), digest_size=16).digest()
+
+class FingerprintIndex(object):
+    """Programs bucketed by input types and fingerprint."""
+
+    def __init__(self):
+        self.buckets = collections.defaultdict(list)
+        # program -> key of its bucket
+        self.keys = {}
+
+    def get_key(self, program):
+        key = self.keys.get(program)
+        if key is None:
+            key = program.input_types, get_fingerprint(program)
+        return key
+
+    def add(self, program):
+        key = self.get_key(program)
+        self.keys[program] = key
+        self.buckets[key].append(program)
+
+    def get(self, program):
+        """Returns the programs added with the same fingerprint as program."""
+        return self.buckets.get(self.get_key(program), [])
@@ -1,5 +1,5 @@
 from deepcoder.dsl import constants
-from deepcoder.dsl.value import Value, IntValue, ListValue, NULLVALUE
+from deepcoder.dsl.value import Value
 from deepcoder.dsl.types import FunctionType
 
 class OutputOutOfRangeError(Exception):
@@ -9,12 +9,13 @@ class NullInputError(Exception):
     pass
 
 def in_range(val):
-    if isinstance(val, IntValue):
-        val = ListValue([val.val])
-    for x in val.val:
-        if x < constants.INTMIN or x > constants.INTMAX:
-            return False
-    return True
+    return raw_in_range(val.val)
+
+def raw_in_range(val):
+    """Returns True if the raw int or list val is within [INTMIN, INTMAX]."""
+    if isinstance(val, int):
+        return constants.INTMIN <= val <= constants.INTMAX
+    return not val or (min(val) >= constants.INTMIN and max(val) <= constants.INTMAX)
 
 class Function(Value):
     def __init__(self, name, f, input_type, output_type):
@@ -22,15 +23,24 @@ class Function(Value):
         self.name = name
 
     def __call__(self, *args):
+        return Value.construct(self.call_raw(*[x.val for x in args]), self.output_type)
+
+    def call_raw(self, *args):
+        """Calls the function on raw values: ints, lists, None for null and the
+        raw functions of lambdas.
+
+        Returns:
+            raw output. None if null
+        Raises:
+            NullInputError, OutputOutOfRangeError
+        """
         for arg in args:
-            if arg == NULLVALUE:
+            if arg is None:
                 raise NullInputError('{}({})'.format(self.name, args))
-        raw_args = [x.val for x in args]
-        output_raw = self.val(*raw_args)
-        output_val = Value.construct(output_raw, self.output_type)
-        if output_val != NULLVALUE and not in_range(output_val):
+        output = self.val(*args)
+        if output is not None and not raw_in_range(output):
             raise OutputOutOfRangeError('{}({})'.format(self.name, args))
-        return output_val
+        return output
 
     @property
     def input_type(self):
@@ -67,9 +67,9 @@ LMIN = Function('min', min, (INT, INT), INT)
 LMAX = Function('max', max, (INT, INT), INT)
 
 # higher order functions
-def _map(f, xs): return tuple(f(x) for x in xs)
+def _map(f, xs): return [f(x) for x in xs]
 MAP = Function('MAP', _map, (FunctionType(INT, INT), LIST), LIST)
-def _filter(f, xs): return tuple(x for x in xs if f(x))
+def _filter(f, xs): return [x for x in xs if f(x)]
 FILTER = Function('FILTER', _filter, (FunctionType(INT, BOOL), LIST), LIST)
 def _count(f, xs): return len(_filter(f, xs))
 COUNT = Function('COUNT', _count, (FunctionType(INT, BOOL), LIST), INT)
@@ -80,9 +80,9 @@ def _scan1l(f, xs):
             ys[i] = f(ys[i - 1], x)
         else:
             ys[i] = x
-    return tuple(ys)
+    return ys
 SCAN1L = Function('SCAN1L', _scan1l, (FunctionType((INT, INT), INT), LIST), LIST)
-def _zipwith(f, xs, ys): return tuple(f(x, y) for x, y in zip(xs, ys))
+def _zipwith(f, xs, ys): return [f(x, y) for x, y in zip(xs, ys)]
 ZIPWITH = Function('ZIPWITH', _zipwith, (FunctionType((INT, INT), INT), LIST, LIST), LIST)
 
 LAMBDAS = [
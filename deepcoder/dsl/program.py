@@ -1,16 +1,128 @@
-
-import numpy as np
+import functools
+import itertools
 
 from deepcoder.dsl.constants import INTMIN, INTMAX
 from deepcoder.dsl.types import INT, LIST
-from deepcoder.dsl.impl import NAME2FUNC
-from deepcoder.dsl.function import Function
-from deepcoder.dsl.value import IntValue, ListValue, NULLVALUE
+from deepcoder.dsl.impl import FUNCTIONS, NAME2FUNC, SCAN1L
+from deepcoder.dsl.function import Function, NullInputError, OutputOutOfRangeError
+from deepcoder.dsl.value import Value
 
 # Parsed program
 
 # statement: (function, (input0, input1, ..., inputn))
 
+# function -> opcode
+OPCODES = {f: i for i, f in enumerate(FUNCTIONS)}
+# opcode -> number of arguments
+ARITY = [len(f.type.input_types) for f in FUNCTIONS]
+
+def encode_stmt(stmt):
+    """Returns the part of Program.code for a statement."""
+    f, args = stmt
+    return (OPCODES[f],) + tuple(x if isinstance(x, int) else ~OPCODES[x] for x in args)
+
+# max number of compiled programs kept
+COMPILE_CACHE_SIZE = 1 << 16
+
+# lambda name -> python expression of its arguments, inlined by compile_code
+LAMBDA_EXPRS = {
+    '+1': '({0} + 1)',
+    '-1': '({0} - 1)',
+    '*2': '({0} * 2)',
+    '/2': 'int({0} / 2)',
+    '*-1': '(-{0})',
+    '**2': '({0} ** 2)',
+    '*3': '({0} * 3)',
+    '/3': 'int({0} / 3)',
+    '*4': '({0} * 4)',
+    '/4': 'int({0} / 4)',
+    '>0': '({0} > 0)',
+    '<0': '({0} < 0)',
+    'EVEN': '({0} % 2 == 0)',
+    'ODD': '({0} % 2 == 1)',
+    '+': '({0} + {1})',
+    '-': '({0} - {1})',
+    '*': '({0} * {1})',
+    'min': 'min({0}, {1})',
+    'max': 'max({0}, {1})',
+}
+
+# higher order function name -> python expression of the inlined lambda applied to
+# x (and y) and the list arguments
+HIGHER_ORDER_EXPRS = {
+    'MAP': '[{lam} for x in {0}]',
+    'FILTER': '[x for x in {0} if {lam}]',
+    'COUNT': 'len([x for x in {0} if {lam}])',
+    'ZIPWITH': '[{lam} for x, y in zip({0}, {1})]',
+}
+
+@functools.lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile_code(nb_inputs, code):
+    """Generates a straight-line python function that runs code on raw values.
+
+    Lambdas are inlined into MAP, FILTER, COUNT and ZIPWITH. Every other function
+    and lambda is bound to a global of the generated function. The null and range
+    checks are inlined for each statement.
+
+    Args:
+        nb_inputs (int): number of program inputs
+        code (tuple): see Program.code
+    Returns:
+        function of raw inputs to raw output with the same behavior as
+        Program.call_raw
+    """
+    env = {
+        'INTMIN': INTMIN,
+        'INTMAX': INTMAX,
+        'NullInputError': NullInputError,
+        'OutputOutOfRangeError': OutputOutOfRangeError,
+        'accumulate': itertools.accumulate,
+    }
+    inputs = ['v{}'.format(i) for i in range(nb_inputs)]
+    lines = ['def program({}):'.format(', '.join(inputs))]
+    out = None
+    i = 0
+    nb_vars = nb_inputs
+    while i < len(code):
+        f = FUNCTIONS[code[i]]
+        nb_args = ARITY[code[i]]
+        args = []
+        variables = []
+        for x in code[i + 1:i + 1 + nb_args]:
+            if x >= 0:
+                args.append('v{}'.format(x))
+                variables.append(args[-1])
+            else:
+                args.append('f{}'.format(~x))
+                env[args[-1]] = FUNCTIONS[~x].val
+        fname = 'f{}'.format(code[i])
+        out = 'v{}'.format(nb_vars)
+        nb_vars += 1
+        if f.name in HIGHER_ORDER_EXPRS:
+            lam = LAMBDA_EXPRS[FUNCTIONS[~code[i + 1]].name].format('x', 'y')
+            call = HIGHER_ORDER_EXPRS[f.name].format(*args[1:], lam=lam)
+        elif f == SCAN1L:
+            call = 'list(accumulate({}, {}))'.format(args[1], args[0])
+        else:
+            env[fname] = f.val
+            call = '{}({})'.format(fname, ', '.join(args))
+        error = "'{}(%r)' % (({},),)".format(f.name, ', '.join(args))
+
+        if variables:
+            lines.append('    if {}:'.format(' or '.join(x + ' is None' for x in variables)))
+            lines.append('        raise NullInputError({})'.format(error))
+        lines.append('    {} = {}'.format(out, call))
+        if f.output_type == INT:
+            lines.append('    if {0} is not None and not INTMIN <= {0} <= INTMAX:'.format(out))
+        else:
+            lines.append('    if {0} and (min({0}) < INTMIN or max({0}) > INTMAX):'.format(out))
+        lines.append('        raise OutputOutOfRangeError({})'.format(error))
+        i += 1 + nb_args
+    lines.append('    return {}'.format(out))
+
+    exec('\n'.join(lines), env)
+    return env['program']
+
 def get_unused_indices(program):
     """Returns unused indices of variables/statements in program."""
     used = set()
@@ -50,16 +162,72 @@ class Program(object):
     """
     Attributes:
         input_types (tuple): tuple of Type (INT,LIST) representing inputs
+        code (tuple): flat tuple of ints encoding the statements. each statement is the
+            opcode of its function followed by its arguments. variables are their
+            index and lambdas are ~opcode. opcodes index into impl.FUNCTIONS
         stmts (tuple): tuple of statements. each statement is pair of function, tuple of mixed type representing arguments
         types (tuple): tuple of Type for all variables
         prefix (str): prefix string that completely describes program
     """
+    __slots__ = ('input_types', 'code', '_prefix', '_hash')
+
     def __init__(self, input_types, stmts):
         self.input_types = tuple(input_types)
-        self.stmts = tuple(stmts)
-        self.types = tuple(list(self.input_types) + [f.type.output_type for f, _ in self.stmts])
-        self.prefix = self.toprefix()
-        self._hash = hash(self.prefix)
+        self.code = tuple(itertools.chain.from_iterable(encode_stmt(x) for x in stmts))
+        self._prefix = None
+        self._hash = None
+
+    @classmethod
+    def from_code(cls, input_types, code):
+        """Returns the Program with the given input types and code."""
+        program = cls.__new__(cls)
+        program.input_types = tuple(input_types)
+        program.code = tuple(code)
+        program._prefix = None
+        program._hash = None
+        return program
+
+    def compile(self):
+        """Returns a compiled function of raw inputs to raw output (see call_raw).
+
+        Compiled functions are cached by code.
+        """
+        return compile_code(len(self.input_types), self.code)
+
+    @property
+    def stmts(self):
+        stmts = []
+        code = self.code
+        i = 0
+        while i < len(code):
+            nb_args = ARITY[code[i]]
+            args = tuple(x if x >= 0 else FUNCTIONS[~x] for x in code[i + 1:i + 1 + nb_args])
+            stmts.append((FUNCTIONS[code[i]], args))
+            i += 1 + nb_args
+        return tuple(stmts)
+
+    @property
+    def types(self):
+        return self.input_types + tuple(f.type.output_type for f, _ in self.stmts)
+
+    @property
+    def output_type(self):
+        """Type of the last variable."""
+        code = self.code
+        i = 0
+        last = None
+        while i < len(code):
+            last = code[i]
+            i += 1 + ARITY[last]
+        if last is None:
+            return self.input_types[-1]
+        return FUNCTIONS[last].output_type
+
+    @property
+    def prefix(self):
+        if self._prefix is None:
+            self._prefix = self.toprefix()
+        return self._prefix
 
     def functions(self):
         for func, args in self.stmts:
@@ -83,10 +251,14 @@ class Program(object):
         return str(self)
 
     def __hash__(self):
+        if self._hash is None:
+            self._hash = hash((self.input_types, self.code))
         return self._hash
 
     def __eq__(self, other):
-        return hash(self) == hash(other)
+        if not isinstance(other, Program):
+            return False
+        return self.code == other.code and self.input_types == other.input_types
 
     def __lt__(self, other):
         #if len(self.types) < len(other.types):
@@ -122,16 +294,23 @@ class Program(object):
         return Program(input_types, tuple(stmts))
 
     def __call__(self, *inputs):
-        if not self.stmts:
-            return NULLVALUE
+        return Value.construct(self.call_raw(*[x.val for x in inputs]))
+
+    def call_raw(self, *inputs):
+        """Runs the program on raw inputs (ints and lists).
+
+        Returns:
+            raw output. None if null
+        """
+        if not self.code:
+            return None
         vals = list(inputs)
-        for f, inputs in self.stmts:
-            args = []
-            for input in inputs:
-                if isinstance(input, int):
-                    args.append(vals[input])
-                else:
-                    args.append(input)
-            val = f(*args)
-            vals.append(val)
-        return vals[-1]
\ No newline at end of file
+        code = self.code
+        i = 0
+        while i < len(code):
+            nb_args = ARITY[code[i]]
+            args = [vals[x] if x >= 0 else FUNCTIONS[~x].val
+                    for x in code[i + 1:i + 1 + nb_args]]
+            vals.append(FUNCTIONS[code[i]].call_raw(*args))
+            i += 1 + nb_args
+        return vals[-1]
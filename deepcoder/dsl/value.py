@@ -2,14 +2,15 @@ from deepcoder.dsl import constants
 from deepcoder.dsl.types import INT, LIST, NULLTYPE
 
 class Value(object):
+    """Typed view of a raw value (int, list or None for null).
+
+    The name and hash are computed on first use.
+    """
     def __init__(self, val, typ):
         self._val = val
         self._typ = typ
-        self._name = str(self._val)
-        if self._typ == LIST:
-            self._hash = hash(tuple(val))
-        else:
-            self._hash = hash(val)
+        self._name = None
+        self._hash = None
 
     @property
     def type(self):
@@ -20,6 +21,11 @@ class Value(object):
         return self._val
 
     def __hash__(self):
+        if self._hash is None:
+            if self._typ == LIST:
+                self._hash = hash(tuple(self._val))
+            else:
+                self._hash = hash(self._val)
         return self._hash
 
     def __eq__(self, other):
@@ -28,10 +34,12 @@ class Value(object):
         return self.val == other.val and self.type == other.type
 
     def __str__(self):
+        if self._name is None:
+            self._name = str(self._val)
         return self._name
 
     def __repr__(self):
-        return self._name
+        return str(self)
 
     @classmethod
     def construct(self, val, typ=None):
@@ -42,7 +50,7 @@ class Value(object):
             raw_type = type(val)
             if raw_type == int:
                 typ = INT
-            elif raw_type == list:
+            elif raw_type == list or raw_type == tuple:
                 typ = LIST
 
         if typ == INT:
@@ -0,0 +1,225 @@
+"""Counting and uniform sampling of the programs of search.enumerate_programs.
+
+How a program can go on only depends on the number of statements left and, for
+each variable type, the number of variables and how many of them no statement uses
+yet, as long as equivalent and duplicate statements are allowed. Programs are
+counted by dynamic programming over those states. Sampling walks down the same
+counts and rejects programs with a statement enumerate_programs skips, so samples
+are uniform over exactly the programs it enumerates.
+"""
+import bisect
+import functools
+import itertools
+import random
+
+from deepcoder import search
+from deepcoder.dsl import fingerprint
+from deepcoder.dsl import types
+from deepcoder.dsl.program import Program
+from deepcoder.dsl.types import INT, LIST
+
+# types of the variables of a program, in the order of the counts of a state
+VARIABLE_TYPES = (INT, LIST)
+
+@functools.lru_cache(maxsize=None)
+def _nb_args(n, u, a, j, k):
+    """Returns the number of ways to fill a arguments from n variables so that k
+    distinct variables of u unused ones are used, with j of them already used."""
+    if a == 0:
+        return int(j == k)
+    # a used variable or an unused one already taken keeps j
+    return ((n - u + j) * _nb_args(n, u, a - 1, j, k) +
+            (u - j) * _nb_args(n, u, a - 1, j + 1, k))
+
+class ProgramSampler(object):
+    """Counts and samples the fully used programs with T statements in ctx.
+
+    Attributes:
+        nb_rejected (int): sampled programs thrown out for a statement that
+            enumerate_programs skips
+    """
+
+    def __init__(self, ctx, T, seed=None):
+        """
+        Args:
+            ctx: search context
+            T: number of statements of the programs
+            seed: seed of the random numbers. default None (from the os)
+        """
+        self.ctx = ctx
+        self.T = T
+        self.rng = random.Random(seed)
+        self.nb_rejected = 0
+        # (function, number of ways to pick its lambdas, number of variable
+        # arguments of each type, arguments, index of the output type). each
+        # argument is the list of lambdas it can be or the index of its type
+        self.shapes = []
+        for f in ctx.functions:
+            nb_lambdas = 1
+            arities = [0] * len(VARIABLE_TYPES)
+            slots = []
+            for input_type in f.type.input_types:
+                if isinstance(input_type, types.FunctionType):
+                    nb_lambdas *= len(ctx.typemap[input_type])
+                    slots.append(ctx.typemap[input_type])
+                else:
+                    slots.append(VARIABLE_TYPES.index(input_type))
+                    arities[slots[-1]] += 1
+            if nb_lambdas:
+                self.shapes.append((f, nb_lambdas, tuple(arities), tuple(slots),
+                                    VARIABLE_TYPES.index(f.output_type)))
+        self._counts = {}
+        self._moves = {}
+
+    def _count(self, t, ns, us):
+        """Returns the number of ways to add t statements to a program with ns
+        variables and us unused variables of each type that use every variable but
+        the last."""
+        if t == 0:
+            return int(sum(us) == 1)
+        key = t, ns, us
+        if key not in self._counts:
+            moves = self._get_moves(t, ns, us)
+            self._counts[key] = moves[0][-1] if moves[0] else 0
+        return self._counts[key]
+
+    def _get_moves(self, t, ns, us):
+        """Returns the cumulative counts of programs and the next statements they
+        start with as (shape, number of unused variables it uses of each type)."""
+        key = t, ns, us
+        if key not in self._moves:
+            totals = []
+            moves = []
+            total = 0
+            for shape in self.shapes:
+                _, nb_lambdas, arities, _, out = shape
+                for ks in itertools.product(*[range(min(a, u) + 1)
+                                              for a, u in zip(arities, us)]):
+                    nb = nb_lambdas
+                    for n, u, a, k in zip(ns, us, arities, ks):
+                        nb *= _nb_args(n, u, a, 0, k)
+                    if not nb:
+                        continue
+                    next_ns = tuple(n + (i == out) for i, n in enumerate(ns))
+                    next_us = tuple(u - k + (i == out) for i, (u, k) in enumerate(zip(us, ks)))
+                    nb *= self._count(t - 1, next_ns, next_us)
+                    if nb:
+                        total += nb
+                        totals.append(total)
+                        moves.append((shape, ks))
+            self._moves[key] = totals, moves
+        return self._moves[key]
+
+    def count(self, input_types):
+        """Returns the number of programs with input_types.
+
+        Equivalent and duplicate statements are counted, so it is an upper bound of
+        the number enumerate_programs enumerates.
+        """
+        counts = tuple(list(input_types).count(x) for x in VARIABLE_TYPES)
+        return self._count(self.T, counts, counts)
+
+    def _choose(self, totals):
+        """Returns an index with probability proportional to its count."""
+        return bisect.bisect_right(totals, self.rng.randrange(totals[-1]))
+
+    def _sample_stmts(self, input_types, redundant):
+        """Returns the statements of a program with input_types sampled uniformly
+        from the programs counted, or None if it has a statement redundant skips or
+        a duplicate statement."""
+        type_to_vars = [[i for i, x in enumerate(input_types) if x == y]
+                        for y in VARIABLE_TYPES]
+        unused = set(range(len(input_types)))
+        stmts = ()
+        for t in range(self.T, 0, -1):
+            type_to_unused = [[i for i in xs if i in unused] for xs in type_to_vars]
+            ns = tuple(map(len, type_to_vars))
+            us = tuple(map(len, type_to_unused))
+            totals, moves = self._get_moves(t, ns, us)
+            (f, _, arities, slots, out), ks = moves[self._choose(totals)]
+
+            # arguments of each type left to fill and unused variables taken
+            left = list(arities)
+            taken = [[] for _ in VARIABLE_TYPES]
+            args = []
+            for slot in slots:
+                if not isinstance(slot, int):
+                    args.append(self.rng.choice(slot))
+                    continue
+                n, u, k, j = ns[slot], us[slot], ks[slot], len(taken[slot])
+                left[slot] -= 1
+                keep = (n - u + j) * _nb_args(n, u, left[slot], j, k)
+                new = (u - j) * _nb_args(n, u, left[slot], j + 1, k)
+                if self.rng.randrange(keep + new) < keep:
+                    x = self.rng.choice([x for x in type_to_vars[slot]
+                                         if x not in unused or x in taken[slot]])
+                else:
+                    x = self.rng.choice([x for x in type_to_unused[slot]
+                                         if x not in taken[slot]])
+                    taken[slot].append(x)
+                args.append(x)
+
+            stmt = f, tuple(args)
+            if stmt in stmts or redundant.skips(stmts, stmt):
+                return None
+            index = len(input_types) + len(stmts)
+            unused.difference_update(args)
+            unused.add(index)
+            type_to_vars[out].append(index)
+            stmts += (stmt,)
+        return stmts
+
+    def sample(self, input_type_combinations):
+        """Returns a program sampled uniformly from the programs enumerate_programs
+        enumerates for input_type_combinations."""
+        input_type_combinations = [tuple(x) for x in input_type_combinations]
+        totals = list(itertools.accumulate(self.count(x) for x in input_type_combinations))
+        if not totals or not totals[-1]:
+            raise ValueError('no programs with {} statements'.format(self.T))
+        while True:
+            input_types = input_type_combinations[self._choose(totals)]
+            redundant = search.get_redundant(self.ctx, len(input_types), self.T)
+            # a program is thrown out as soon as it has a skipped statement, which
+            # keeps the programs returned uniform
+            stmts = self._sample_stmts(input_types, redundant)
+            if stmts is None:
+                self.nb_rejected += 1
+                continue
+            return Program(input_types, stmts)
+
+def count_programs(input_type_combinations, T, ctx):
+    """Returns the number of fully used programs with T statements in ctx, an upper
+    bound of the number of programs of enumerate_programs (see
+    ProgramSampler.count)."""
+    sampler = ProgramSampler(ctx, T)
+    return sum(sampler.count(x) for x in input_type_combinations)
+
+def sample_programs(input_type_combinations, T, ctx, nb_programs, seed=None, dedupe=False):
+    """Yields distinct programs of enumerate_programs sampled uniformly.
+
+    Programs are drawn until nb_programs distinct ones are found, so nb_programs
+    should be well below count_programs. Every program drawn is kept in memory to
+    tell repeats.
+
+    Args:
+        input_type_combinations (list): list of list of INT or LIST
+        T (int): number of statements of each program
+        ctx (Context): search context
+        nb_programs (int): number of programs
+        seed: seed of the random numbers. default None (from the os)
+        dedupe (bool): skip programs with the fingerprint of one already yielded
+            (see dsl.fingerprint). default False
+    """
+    sampler = ProgramSampler(ctx, T, seed)
+    if nb_programs > sum(sampler.count(x) for x in input_type_combinations):
+        raise ValueError('fewer than {} programs with {} statements'.format(nb_programs, T))
+    seen = set()
+    nb_yielded = 0
+    while nb_yielded < nb_programs:
+        program = sampler.sample(input_type_combinations)
+        key = fingerprint.get_fingerprint(program) if dedupe else program
+        if key in seen:
+            continue
+        seen.add(key)
+        yield program
+        nb_yielded += 1
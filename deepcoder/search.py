@@ -1,20 +1,47 @@
 import collections
 import concurrent.futures
-import copy
+import functools
+import heapq
 import itertools
 import multiprocessing
-import queue
-import time
 
 import numpy as np
 
 import tqdm
 
 from deepcoder import context
+from deepcoder import stats as search_stats
+from deepcoder.dsl import batch
+from deepcoder.dsl import equivalence
+from deepcoder.dsl import fingerprint
+from deepcoder.dsl import impl
 from deepcoder.dsl.value import IntValue, NULLVALUE
 from deepcoder.dsl import types
-from deepcoder.dsl.function import OutputOutOfRangeError, NullInputError
-from deepcoder.dsl.program import Program, get_unused_indices
+from deepcoder.dsl.function import (Function, OutputOutOfRangeError, NullInputError,
+    raw_in_range)
+from deepcoder.dsl.program import Program, encode_stmt
+
+# max number of variables a statement can take. a statement can leave at most this
+# many fewer unused statements than before, minus one for itself
+MAX_NB_VARIABLE_ARGS = max(
+    len([x for x in f.type.input_types if not isinstance(x, types.FunctionType)])
+    for f in impl.FUNCTIONS)
+
+# fragments that have a smaller equivalent. see scripts/mine-equivalences.py
+EQUIVALENCES = equivalence.load()
+
+def get_redundant(ctx, nb_inputs, T):
+    """Returns the RedundantStmts that dfs and enumerate_programs skip in ctx for
+    programs with nb_inputs inputs and up to T statements.
+
+    Searches over the same functions share one RedundantStmts, which keeps the
+    statements it has looked up.
+    """
+    return _get_redundant(frozenset(ctx.scores_map), nb_inputs, T)
+
+@functools.lru_cache(maxsize=64)
+def _get_redundant(functions, nb_inputs, T):
+    return equivalence.RedundantStmts(EQUIVALENCES, functions, nb_inputs, nb_inputs + T)
 
 def iterate_inputs(f, type_to_inputs):
     """Yields the cartesian product over valid inputs for f according to type_to_inputs.
@@ -31,6 +58,30 @@ def iterate_inputs(f, type_to_inputs):
     for args in itertools.product(*argslists):
         yield args
 
+def get_type_to_inputs(input_types, stmts, ctx):
+    """Returns candidate arguments for the next statement of a program.
+
+    Args:
+        input_types: list of Type of program inputs
+        stmts: statements of the program so far
+        ctx: Context. lambdas are added in ctx order
+    Returns:
+        dict of type -> list of variable indices / Functions. Statements
+        come before inputs with the most recent statement first.
+    """
+    type_to_inputs = collections.defaultdict(list)
+    for i, input_type in enumerate(input_types):
+        type_to_inputs[input_type].append(i)
+
+    for i, stmt in enumerate(stmts):
+        # favor more recent statements
+        output_type = stmt[0].output_type
+        type_to_inputs[output_type].insert(0, (len(input_types) + i))
+
+    for k, v in ctx.typemap.items():
+        type_to_inputs[k] += v
+    return type_to_inputs
+
 def is_solution(program, examples):
     for inputs, output in examples:
         if program(*inputs) != output:
@@ -43,204 +94,1083 @@ def has_null(program, examples):
             return True
     return False
 
-def dfs(examples, T, ctx, gas=np.inf):
+def evaluate_stmt(stmt, vals_list):
+    """Evaluates a single statement on every example.
+
+    Args:
+        stmt: tuple of Function, arguments
+        vals_list: list of list of raw values (see Function.call_raw). values of all
+            variables for each example
+    Returns:
+        list of raw values, the statement's result for each example
+    Raises:
+        NullInputError, OutputOutOfRangeError
+    """
+    f, args = stmt
+    args = [x if isinstance(x, int) else x.val for x in args]
+    results = []
+    for vals in vals_list:
+        results.append(f.call_raw(*[vals[x] if isinstance(x, int) else x for x in args]))
+    return results
+
+def stmt_is_solution(stmt, vals_list, outputs):
+    """Returns True if stmt evaluates to outputs on every example.
+
+    Stops at the first example that doesn't match. Values are raw (see evaluate_stmt).
+
+    Raises:
+        NullInputError, OutputOutOfRangeError
+    """
+    f, args = stmt
+    args = [x if isinstance(x, int) else x.val for x in args]
+    for vals, output in zip(vals_list, outputs):
+        if f.call_raw(*[vals[x] if isinstance(x, int) else x for x in args]) != output:
+            return False
+    return True
+
+def iterate_stmts(input_types, stmts, ctx, stats=None, functions=None, redundant=None):
+    """Yields the candidate next statements of a program in dfs order.
+
+    Args:
+        input_types: list of Type of program inputs
+        stmts: statements of the program so far
+        ctx: Context
+        stats: SearchStats. counts the skipped statements
+        functions: list of Function to try. default ctx.functions
+        redundant: RedundantStmts to skip. see get_redundant
+    Yields:
+        tuple of Function, arguments not already in stmts
+    """
+    type_to_inputs = get_type_to_inputs(input_types, stmts, ctx)
+    used = set(stmts)
+    skipped = used
+    if redundant is not None:
+        skipped = skipped | redundant.get(stmts)
+    for f in ctx.functions if functions is None else functions:
+        for args in iterate_inputs(f, type_to_inputs):
+            stmt = (f, args)
+            if stmt not in skipped:
+                yield stmt
+            elif stats is not None:
+                reason = search_stats.DUPLICATE if stmt in used else search_stats.EQUIVALENT
+                stats.prunes[reason] += 1
+
+def get_leaf_functions(examples, ctx):
+    """Returns the functions of ctx that return the type of the example outputs."""
+    output_types = {output.type for _, output in examples} - {types.NULLTYPE}
+    return [f for f in ctx.functions if all(f.output_type == x for x in output_types)]
+
+def iterate_first_stmts(examples, T, ctx):
+    """Yields the candidate first statements of dfs in order."""
+    input_types = [x.type for x in examples[0][0]]
+    functions = get_leaf_functions(examples, ctx) if T == 1 else None
+    return iterate_stmts(input_types, (), ctx, functions=functions,
+        redundant=get_redundant(ctx, len(input_types), T))
+
+def dfs(examples, T, ctx, gas=np.inf, batched=False, stats=None, must_use=None,
+        deadline=None):
     """Runs dfs search up to depth T or until a program is found that matches output.
+
+    The values of every variable on every example are kept along the search path
+    so each node only evaluates its newest statement.
+
+    The search is goal-directed: the last statement only uses functions that return
+    the type of the outputs, and programs are thrown out once the statements left
+    can't use all of their unused statements. Statements with a smaller equivalent
+    in EQUIVALENCES are skipped.
+
     Args:
         examples: list of tuples of (inputs, output)
         T: max depth
         ctx: Context. used to restrict/order the set of functions that dfs searches over.
         gas (int): limit on number of node expansions. default to np.inf (unlimited)
+        batched (bool): evaluate statements on all examples at once with numpy
+            (see dsl.batch). default False
+        stats (SearchStats): if set, filled in with counters of the search
+        must_use (set): if set, only programs that use at least one of these functions
+            or lambdas are counted as steps and checked. the others are still
+            evaluated to reach their children, which uses gas
+        deadline (Deadline): if set, the search stops once it expires or is cancelled
 
     Returns:
         tuple of solution program, number of steps
     """
+    ns = { 'gas': gas }
+
+    def spend():
+        ns['gas'] -= 1
+        return ns['gas'] <= 0 or (deadline is not None and deadline.expired())
+
+    solution, nb_steps, _ = _dfs(examples, T, ctx, spend, batched, stats=stats,
+        must_use=must_use)
+    return solution, nb_steps
+
+def _dfs(examples, T, ctx, spend, batched=False, first_stmt=None, stats=None,
+        must_use=None):
+    """Implementation of dfs.
+
+    Args:
+        spend: called after every step and every other evaluated program. returns
+            True if the search should stop
+        first_stmt: if set, only programs starting with this statement are searched
+            and the empty program isn't counted as a step
+        stats, must_use: see dfs
+
+    Returns:
+        tuple of solution program, number of steps, whether spend stopped the search
+    """
     ns = { 'nb_steps': 0,
            'solution': None,
-           'gas' : gas }
+           'stopped': False }
 
     # init
     input_types = [x.type for x in examples[0][0]]
-    input_type_to_inputs = collections.defaultdict(list)
-    for i, input_type in enumerate(input_types):
-        input_type_to_inputs[input_type].append(i)
-    p_base = Program(input_types, tuple())
+    leaf_functions = get_leaf_functions(examples, ctx)
+    redundant = get_redundant(ctx, len(input_types), T)
+
+    if batched:
+        # vals is a Batch for each variable, results is a Batch
+        outputs = batch.Batch.from_values([output for _, output in examples])
+        vals = batch.from_inputs([inputs for inputs, _ in examples])
+        null_results = batch.Batch.from_values([NULLVALUE] * len(examples))
+
+        def evaluate(stmt, vals):
+            f, args = stmt
+            return batch.call(f, *[vals[x] if isinstance(x, int) else x for x in args])
+
+        def extend(vals, results):
+            return vals + [results]
+
+        def has_null_results(results):
+            return results.null.any()
+
+        def leaf_is_solution(stmt, vals):
+            return evaluate(stmt, vals) == outputs
+
+        def get_depth(vals):
+            return len(vals) - len(input_types) + 1
+    else:
+        # vals is a list of raw values for each example, results is a list of raw values
+        outputs = [output.val for _, output in examples]
+        vals = [[x.val for x in inputs] for inputs, _ in examples]
+        null_results = [None] * len(examples)
+        evaluate = evaluate_stmt
+
+        def extend(vals_list, results):
+            return [vals + [x] for vals, x in zip(vals_list, results)]
+
+        def has_null_results(results):
+            return None in results
 
-    def dfshelper(p_base, t):
+        def leaf_is_solution(stmt, vals_list):
+            return stmt_is_solution(stmt, vals_list, outputs)
+
+        def get_depth(vals_list):
+            return len(vals_list[0]) - len(input_types) + 1
+
+    if stats is not None:
+        evaluate = stats.instrument(evaluate, get_depth)
+        leaf_is_solution = stats.instrument(leaf_is_solution, get_depth)
+
+    def step():
         ns['nb_steps'] += 1
-        ns['gas'] -= 1
-        try:
-            if is_solution(p_base, examples):
-                ns['solution'] = p_base
+        ns['stopped'] = spend()
+        return ns['stopped']
+
+    def uses(stmt):
+        f, args = stmt
+        return f in must_use or any(x in must_use for x in args)
+
+    def dfshelper(stmts, vals, results, t, unused, is_new=True):
+        """
+        Args:
+            stmts: statements of the program at this node
+            vals: values of every variable of the program
+            results: values of the output of the program
+            t: depth
+            unused: frozenset of indices of statements no other statement uses
+            is_new: False if the program doesn't use must_use
+        """
+        if is_new:
+            stopped = step()
+            if results == outputs:
+                ns['solution'] = Program(input_types, stmts)
                 return True
-        except (NullInputError, OutputOutOfRangeError):
-            # throw out programs that have null inputs or any out of range output
-            # null outputs ok if unused
-            return
 
-        if ns['gas'] <= 0:
+            if stopped:
+                return True
+        elif t > 0 and spend():
+            # an old program isn't a step but was still evaluated, so it costs gas
+            ns['stopped'] = True
             return True
 
         if t == T:
             return
 
-        # type -> list of input indices / Functions
-        type_to_inputs = collections.defaultdict(list)
-        for k, v in input_type_to_inputs.items():
-            type_to_inputs[k] += v
+        if stats is not None:
+            stats.nb_expansions += 1
+        candidates = iterate_stmts(input_types, stmts, ctx, stats,
+            leaf_functions if t + 1 == T else None, redundant)
+        return expand(stmts, vals, t, candidates, unused, is_new)
+
+    def expand(stmts, vals, t, candidates, unused, is_new=True):
+        """Searches the children of the program made by appending each candidate."""
+        for stmt in candidates:
+            child_is_new = is_new or uses(stmt)
+            if t + 1 == T:
+                if not child_is_new:
+                    continue
+                # the last statement has to use every unused statement
+                if unused and not unused.issubset(stmt[1]):
+                    if stats is not None:
+                        stats.prunes[search_stats.UNUSED] += 1
+                    continue
+                # leaf. only the solution check is needed so stop
+                # evaluating at the first mismatching example.
+                stopped = step()
+                try:
+                    if leaf_is_solution(stmt, vals):
+                        ns['solution'] = Program(input_types, stmts + (stmt,))
+                        return True
+                except (NullInputError, OutputOutOfRangeError) as e:
+                    if stats is not None:
+                        stats.add_error(e)
+                    continue
+                if stopped:
+                    return True
+                continue
+
+            # throw out programs with more unused statements than the statements left
+            # can use
+            child_unused = unused.difference(stmt[1]) | {len(input_types) + t}
+            if len(child_unused) - 1 > (T - t - 1) * (MAX_NB_VARIABLE_ARGS - 1):
+                if stats is not None:
+                    stats.prunes[search_stats.UNUSED] += 1
+                continue
+
+            # throw out programs that have null inputs or any out of range output
+            # null outputs ok if unused
+            try:
+                child_results = evaluate(stmt, vals)
+            except (NullInputError, OutputOutOfRangeError) as e:
+                if stats is not None:
+                    stats.add_error(e)
+                continue
+
+            if has_null_results(child_results):
+                if stats is not None:
+                    stats.prunes[search_stats.NULL_OUTPUT] += 1
+                continue
+
+            if dfshelper(stmts + (stmt,), extend(vals, child_results), child_results, t + 1,
+                    child_unused, child_is_new):
+                return True
+
+    if first_stmt is None:
+        # the empty program evaluates to null
+        dfshelper((), vals, null_results, 0, frozenset(), must_use is None)
+    elif T > 0:
+        expand((), vals, 0, [first_stmt], frozenset(), must_use is None)
+    return ns['solution'], ns['nb_steps'], ns['stopped']
+
+# seconds between checks of the deadline by parallel_dfs
+DEADLINE_POLL_SECS = 0.01
+
+# shared state of parallel_dfs worker processes
+_worker = {}
+
+def _init_dfs_worker(gas, best):
+    _worker['gas'] = gas
+    _worker['best'] = best
+
+def _dfs_branch(examples, T, ctx, i, batched, chunk_size, collect_stats):
+    """Runs dfs on the programs whose first statement is the i-th in dfs order.
+
+    Gas is taken from the shared counter chunk_size steps at a time. The branch
+    stops once gas runs out or a solution is found in an earlier branch.
+
+    Returns:
+        tuple of solution program, number of steps, whether the branch was stopped,
+        SearchStats of the branch or None if not collect_stats
+    """
+    gas, best = _worker['gas'], _worker['best']
+    first_stmt = next(itertools.islice(iterate_first_stmts(examples, T, ctx), i, None))
+    ns = { 'left': 0 }
+
+    def refill():
+        if best.value < i:
+            return False
+        with gas.get_lock():
+            ns['left'] = min(chunk_size, gas.value)
+            gas.value -= ns['left']
+        return ns['left'] > 0
+
+    def spend():
+        ns['left'] -= 1
+        return ns['left'] <= 0 and not refill()
+
+    stats = search_stats.SearchStats() if collect_stats else None
+    if not refill():
+        return None, 0, True, stats
+
+    solution, nb_steps, stopped = _dfs(examples, T, ctx, spend, batched, first_stmt,
+        stats)
+    # give back unused gas
+    with gas.get_lock():
+        gas.value += max(ns['left'], 0)
+    if solution:
+        with best.get_lock():
+            best.value = min(best.value, i)
+    return solution, nb_steps, stopped, stats
+
+def parallel_dfs(examples, T, ctx, gas=np.inf, batched=False, nb_workers=None,
+        chunk_size=100, stats=None, deadline=None):
+    """Runs dfs with its top-level branches split across a pool of processes.
+
+    Each branch searches the programs starting with one choice of first statement.
+    Branches share the gas budget. Once a branch finds a solution, the branches
+    after it in dfs order are stopped and the ones before it run to completion, so
+    the returned solution is the first one in dfs order.
+
+    Args:
+        examples: list of tuples of (inputs, output)
+        T: max depth
+        ctx: Context. used to restrict/order the set of functions that dfs searches over.
+        gas (int): limit on total number of node expansions. default to np.inf (unlimited)
+        batched (bool): see dfs
+        nb_workers (int): number of processes. default None (number of cpus)
+        chunk_size (int): number of steps a branch takes from the shared gas at once
+        stats (SearchStats): if set, filled in with the counters of all branches
+        deadline (Deadline): if set, every branch stops at its next refill of gas
+            once it expires or is cancelled
+
+    Returns:
+        tuple of solution program, number of steps used by all branches and whether
+        dfs with the same gas returns the same solution. The last is False if gas ran
+        out in a branch before the solution's or dfs would have run out of gas
+        before reaching the solution.
+    """
+    input_types = [x.type for x in examples[0][0]]
+    outputs = [output for _, output in examples]
+
+    # the empty program evaluates to null
+    if [NULLVALUE] * len(examples) == outputs:
+        return Program(input_types, tuple()), 1, True
+
+    nb_branches = len(list(iterate_first_stmts(examples, T, ctx))) if T > 0 else 0
+    if gas <= 1 or not nb_branches:
+        return None, 1, True
+
+    gas_value = multiprocessing.Value('d', gas - 1)
+    best = multiprocessing.Value('i', nb_branches)
+    results = [None] * nb_branches
+    with concurrent.futures.ProcessPoolExecutor(nb_workers,
+            initializer=_init_dfs_worker, initargs=(gas_value, best)) as executor:
+        futs = {executor.submit(_dfs_branch, examples, T, ctx, i, batched, chunk_size,
+                    stats is not None): i
+                for i in range(nb_branches)}
+        pending = set(futs)
+        while pending:
+            done, pending = concurrent.futures.wait(pending,
+                timeout=None if deadline is None else DEADLINE_POLL_SECS)
+            for fut in done:
+                results[futs[fut]] = fut.result()
+            if deadline is not None and deadline.check():
+                # stops every branch like a solution in a branch before it
+                best.value = -1
+
+    if stats is not None:
+        # the empty program is expanded into the branches
+        stats.nb_expansions += 1
+        for x in results:
+            stats.merge(x[3])
+
+    nb_steps = 1 + sum(x[1] for x in results)
+    for i, (solution, _, stopped, _) in enumerate(results):
+        if solution:
+            dfs_nb_steps = 1 + sum(x[1] for x in results[:i + 1])
+            return solution, nb_steps, dfs_nb_steps <= gas
+        if stopped:
+            # dfs might have found a solution in the rest of this branch
+            solution = next((x[0] for x in results[i:] if x[0]), None)
+            return solution, nb_steps, False
+    return None, nb_steps, True
+
+def get_costs(ctx, eps=1e-6):
+    """Returns dict of Function -> negative log score for every item in ctx.
+
+    Scores are clipped to eps so unscored functions get a large finite cost.
+    """
+    return {f: -np.log(max(score, eps)) for f, score in ctx.items}
+
+def best_first(examples, T, ctx, gas=np.inf, beam_width=None, stats=None,
+        deadline=None):
+    """Runs best-first search over programs of up to T statements.
+
+    Programs are expanded in order of the summed negative log scores of their
+    functions and lambdas, so the scores in ctx order the whole search instead of
+    just the children of each node. Ties are expanded in the same order as dfs.
+
+    Args:
+        examples: list of tuples of (inputs, output)
+        T: max depth
+        ctx: Context. used to restrict/score the set of functions searched over.
+        gas (int): limit on number of node expansions. default to np.inf (unlimited)
+        beam_width (int): if set, only the beam_width best unexpanded programs are kept
+            (beam search). default None (unbounded)
+        stats (SearchStats): if set, filled in with counters of the search
+        deadline (Deadline): if set, the search stops once it expires or is cancelled
+
+    Returns:
+        tuple of solution program, number of steps
+    """
+    input_types = [x.type for x in examples[0][0]]
+    outputs = [output.val for _, output in examples]
+    costs = get_costs(ctx)
+    counter = itertools.count()
+
+    evaluate = evaluate_stmt
+
+    def leaf_is_solution(stmt, vals_list):
+        return stmt_is_solution(stmt, vals_list, outputs)
+
+    if stats is not None:
+        get_depth = lambda vals_list: len(vals_list[0]) - len(input_types) + 1
+        evaluate = stats.instrument(evaluate, get_depth)
+        leaf_is_solution = stats.instrument(leaf_is_solution, get_depth)
+
+    # the empty program evaluates to null
+    nb_steps = 1
+    if [None] * len(examples) == outputs:
+        return Program(input_types, tuple()), nb_steps
 
-        used = set()
-        for i, stmt in enumerate(p_base.stmts):
-            program = Program(p_base.input_types, p_base.stmts[:i+1])
-            used.add(stmt)
-            # favor more recent statements
-            output_type = stmt[0].output_type
-            type_to_inputs[output_type].insert(0, (len(p_base.input_types) + i))
+    # (cost, tiebreak, stmts, values of parent variables for each example)
+    # the last statement is evaluated when the program is popped
+    frontier = []
 
-        for k, v in ctx.typemap.items():
-            type_to_inputs[k] += v
+    def push_children(stmts, vals_list, cost):
+        if stats is not None:
+            stats.nb_expansions += 1
+        for stmt in iterate_stmts(input_types, stmts, ctx, stats):
+            f, args = stmt
+            stmt_cost = costs[f] + sum(costs[x] for x in args if isinstance(x, Function))
+            heapq.heappush(frontier,
+                (cost + stmt_cost, next(counter), stmts + (stmt,), vals_list))
 
+        if beam_width is not None and len(frontier) > beam_width:
+            frontier[:] = heapq.nsmallest(beam_width, frontier)
+
+    if T > 0:
+        push_children(tuple(), [[x.val for x in inputs] for inputs, _ in examples], 0.)
+
+    while frontier and nb_steps < gas:
+        if deadline is not None and deadline.expired():
+            break
+        cost, _, stmts, vals_list = heapq.heappop(frontier)
+        stmt = stmts[-1]
+        t = len(stmts)
+
+        if t == T:
+            # leaf. only the solution check is needed
+            nb_steps += 1
+            try:
+                if leaf_is_solution(stmt, vals_list):
+                    return Program(input_types, stmts), nb_steps
+            except (NullInputError, OutputOutOfRangeError) as e:
+                if stats is not None:
+                    stats.add_error(e)
+            continue
+
+        # throw out programs that have null inputs or any out of range output
+        # null outputs ok if unused
+        try:
+            results = evaluate(stmt, vals_list)
+        except (NullInputError, OutputOutOfRangeError) as e:
+            if stats is not None:
+                stats.add_error(e)
+            continue
+        if None in results:
+            if stats is not None:
+                stats.prunes[search_stats.NULL_OUTPUT] += 1
+            continue
+
+        nb_steps += 1
+        if results == outputs:
+            return Program(input_types, stmts), nb_steps
+
+        push_children(stmts, [vals + [x] for vals, x in zip(vals_list, results)], cost)
+
+    return None, nb_steps
+
+def term_to_program(input_types, term):
+    """Flattens an expression tree into a Program.
+
+    Identical subexpressions share a single statement.
+
+    Args:
+        input_types: list of Type of program inputs
+        term: input index or tuple of Function, tuple of arguments where
+            each argument is an input index, a lambda Function or a term
+    Returns:
+        Program whose last statement computes term
+    """
+    stmts = []
+    index = {}
+
+    def helper(term):
+        if isinstance(term, int):
+            return term
+        if term not in index:
+            f, args = term
+            new_args = tuple(x if isinstance(x, Function) else helper(x) for x in args)
+            stmts.append((f, new_args))
+            index[term] = len(input_types) + len(stmts) - 1
+        return index[term]
+
+    helper(term)
+    return Program(input_types, stmts)
+
+def bottom_up(examples, T, ctx, gas=np.inf, stats=None, deadline=None):
+    """Enumerates programs bottom-up by number of statements, merging programs
+    with the same values on the examples (observational equivalence).
+
+    The size of a program counts statements shared by its arguments once, so a
+    later program with the same values can fit in T where the first doesn't. So one
+    program is kept per values and values of its statements, and only programs
+    with the values of an input are always thrown out. Programs
+    whose statements have the same values but are different terms can still hide
+    each other, so a program that fits in T isn't always found.
+
+    Programs of size s are built by applying a function from ctx.functions to
+    previously kept programs whose distinct statements add up to s - 1. Functions,
+    lambdas and arguments are tried in ctx order, smaller programs first. Kept
+    programs are indexed by size, so only arguments that can add up to s - 1 are
+    tried.
+
+    Args:
+        examples: list of tuples of (inputs, output)
+        T: max number of statements
+        ctx: Context. used to restrict/order the set of functions searched over.
+        gas (int): limit on number of programs evaluated. default to np.inf (unlimited)
+        stats (SearchStats): if set, filled in with counters of the search. kept
+            programs count as expansions
+        deadline (Deadline): if set, the search stops once it expires or is cancelled
+
+    Returns:
+        tuple of solution program, number of steps
+    """
+    input_types = [x.type for x in examples[0][0]]
+
+    def freeze(val):
+        # raw lists are kept as tuples so values can be hashed
+        return tuple(val) if isinstance(val, list) else val
+
+    outputs = tuple(freeze(output.val) for _, output in examples)
+
+    def evaluate(term, args):
+        """Returns the raw values of term on each example given the bank entries of
+        its arguments."""
+        f = term[0]
+        vals = []
+        for i in range(len(examples)):
+            vals.append(freeze(f.call_raw(*[x[0].val if x[2] is None else x[2][i]
+                                            for x in args])))
+        return tuple(vals)
+
+    if stats is not None:
+        evaluate = stats.instrument(evaluate, lambda args: size)
+
+    # the empty program evaluates to null
+    nb_steps = 1
+    if all(x is None for x in outputs):
+        return Program(input_types, tuple()), nb_steps
+
+    # type -> number of statements -> list of (term, set of statement terms, values)
+    bank = collections.defaultdict(lambda: [[] for _ in range(T + 1)])
+    # type -> number of statements -> statement term -> indices of the entries of
+    # bank that have it
+    holders = collections.defaultdict(
+        lambda: [collections.defaultdict(list) for _ in range(T + 1)])
+    # values of the inputs, and (values, values of the statements) of kept programs
+    input_vals = set()
+    seen = set()
+    # statement term -> its values
+    term_vals = {}
+    for i, input_type in enumerate(input_types):
+        vals = tuple(freeze(inputs[i].val) for inputs, _ in examples)
+        bank[input_type][0].append((i, frozenset(), vals))
+        input_vals.add(vals)
+
+    def iterate_args(slots, last, size, args=(), subterms=frozenset()):
+        """Yields (arguments, their statement terms) for the slots of a function
+        whose statements add up to size - 1, in the order of the slots and the bank.
+        Yields None for each partial set of arguments that is thrown out.
+
+        Args:
+            last: index of the last slot that is a variable
+        """
+        if not slots:
+            yield args, subterms
+            return
+        slot = slots[0]
+        if isinstance(slot, types.FunctionType):
+            for x in ctx.typemap[slot]:
+                yield from iterate_args(slots[1:], last - 1, size,
+                    args + ((x, frozenset(), None),), subterms)
+            return
+        # the last variable has to make up the statements left. it can have more if
+        # it shares some with the other arguments, so only those that share one are
+        # tried
+        nb_left = size - 1 - len(subterms)
+        for nb_subterms in range(max(nb_left, 0) if last == 0 else 0, size):
+            entries = bank[slot][nb_subterms]
+            if last == 0 and nb_subterms > nb_left:
+                indices = set()
+                for term in subterms:
+                    indices.update(holders[slot][nb_subterms].get(term, ()))
+                entries = [entries[i] for i in sorted(indices)]
+            for entry in entries:
+                union = subterms | entry[1]
+                if len(union) > size - 1 or (last == 0 and len(union) < size - 1):
+                    yield None
+                    continue
+                yield from iterate_args(slots[1:], last - 1, size, args + (entry,), union)
+
+    for size in range(1, T + 1):
+        new_entries = []
         for f in ctx.functions:
-            for args in iterate_inputs(f, type_to_inputs):
-                stmt = (f, args)
-                if stmt in used:
+            slots = f.type.input_types
+            last = max(i for i, x in enumerate(slots)
+                       if not isinstance(x, types.FunctionType))
+            for candidate in iterate_args(slots, last, size):
+                if candidate is None:
+                    if deadline is not None and deadline.expired():
+                        return None, nb_steps
                     continue
-                program = Program(p_base.input_types, list(p_base.stmts) + [stmt])
+                args, subterms = candidate
 
+                nb_steps += 1
+                term = (f, tuple(x[0] for x in args))
                 try:
-                    if t + 1 < T and has_null(program, examples):
-                        continue
-                except OutputOutOfRangeError:
+                    vals = evaluate(term, args)
+                except (NullInputError, OutputOutOfRangeError) as e:
+                    if stats is not None:
+                        stats.add_error(e)
+                    vals = None
+
+                if vals is not None:
+                    if vals == outputs:
+                        return term_to_program(input_types, term), nb_steps
+
+                    # an input is smaller than any program with its values and
+                    # shares no statements, so those are always thrown out
+                    key = vals, frozenset(term_vals[x] for x in subterms)
+                    is_equivalent = vals in input_vals or key in seen
+                    # nulls can only be the output of a program
+                    if not is_equivalent and None not in vals:
+                        seen.add(key)
+                        term_vals[term] = vals
+                        new_entries.append((f.output_type, (term, subterms | {term}, vals)))
+                        if stats is not None:
+                            stats.nb_expansions += 1
+                    elif stats is not None:
+                        if is_equivalent:
+                            stats.prunes[search_stats.EQUIVALENT] += 1
+                        else:
+                            stats.prunes[search_stats.NULL_OUTPUT] += 1
+
+                if nb_steps >= gas or (deadline is not None and deadline.expired()):
+                    return None, nb_steps
+
+        for output_type, entry in new_entries:
+            for term in entry[1]:
+                holders[output_type][size][term].append(len(bank[output_type][size]))
+            bank[output_type][size].append(entry)
+
+    return None, nb_steps
+
+def _divide_all(k):
+    def inverse(ys):
+        if any(y % k for y in ys):
+            return None
+        return [y // k for y in ys]
+    return inverse
+
+# statements with a cheap inverse as (function, lambda or None, inverse of the raw
+# output). the inverse returns None if the output has no preimage.
+INVERSES = [
+    (impl.REVERSE, None, lambda ys: ys[::-1]),
+    (impl.MAP, impl.PLUS1, lambda ys: [y - 1 for y in ys]),
+    (impl.MAP, impl.MINUS1, lambda ys: [y + 1 for y in ys]),
+    (impl.MAP, impl.TIMESNEG1, lambda ys: [-y for y in ys]),
+    (impl.MAP, impl.TIMES2, _divide_all(2)),
+    (impl.MAP, impl.TIMES3, _divide_all(3)),
+    (impl.MAP, impl.TIMES4, _divide_all(4)),
+    (impl.SCAN1L, impl.LPLUS, lambda ys: ys[:1] + [b - a for a, b in zip(ys, ys[1:])]),
+]
+
+def get_goal_key(values, is_sorted=False):
+    """Returns the key of raw values in the goals of get_goals.
+
+    Args:
+        values: raw value for each example
+        is_sorted: key of any values that sort to values instead
+    """
+    if is_sorted:
+        return ('sorted', tuple(tuple(sorted(x)) for x in values))
+    return ('exact', tuple(tuple(x) if isinstance(x, list) else x for x in values))
+
+def get_goals(examples, T, ctx):
+    """Inverts the outputs through up to T statements of INVERSES or SORT.
+
+    SORT has every permutation of a sorted list as a preimage, so its goals match
+    any values that sort to them and aren't inverted further.
+
+    Returns:
+        dict of goal key (see get_goal_key) -> shortest tuple of (function, lambda or
+        None) statements that turns the goal into the outputs
+    """
+    outputs = [output.val for _, output in examples]
+    goals = {get_goal_key(outputs): ()}
+    inverses = [(f, lam, inverse) for f, lam, inverse in INVERSES
+        if f in ctx.scores_map and (lam is None or lam in ctx.scores_map)]
+
+    frontier = [(outputs, ())] if all(isinstance(y, list) for y in outputs) else []
+    for _ in range(T):
+        next_frontier = []
+        for ys, chain in frontier:
+            if impl.SORT in ctx.scores_map and all(y == sorted(y) for y in ys):
+                goals.setdefault(get_goal_key(ys, True), ((impl.SORT, None),) + chain)
+            for f, lam, inverse in inverses:
+                xs = [inverse(y) for y in ys]
+                if any(x is None or not raw_in_range(x) for x in xs):
                     continue
+                key = get_goal_key(xs)
+                if key not in goals:
+                    goals[key] = ((f, lam),) + chain
+                    next_frontier.append((xs, goals[key]))
+        frontier = next_frontier
+    return goals
+
+def bidirectional(examples, T, ctx, gas=np.inf, stats=None, deadline=None):
+    """Searches forward from the inputs and backward from the outputs.
+
+    Backward, the outputs are inverted into goals with get_goals. Forward, programs
+    whose statements are all used are enumerated like dfs with iterative deepening,
+    and a program of d statements whose output matches a goal of up to T - d
+    statements is extended into a solution. So a solution that ends with k
+    invertible statements is found at forward depth T - k. The last iteration is
+    dfs, which keeps the search complete.
+
+    Args:
+        examples: list of tuples of (inputs, output)
+        T: max depth
+        ctx: Context. used to restrict/order the set of functions searched over.
+        gas (int): limit on number of node expansions. default to np.inf (unlimited)
+        stats (SearchStats): if set, filled in with counters of the search
+        deadline (Deadline): if set, the search stops once it expires or is cancelled
+
+    Returns:
+        tuple of solution program, number of steps
+    """
+    input_types = [x.type for x in examples[0][0]]
+    nb_inputs = len(input_types)
+    outputs = [output.val for _, output in examples]
+    vals = [[x.val for x in inputs] for inputs, _ in examples]
+    goals = get_goals(examples, T, ctx)
+    leaf_functions = get_leaf_functions(examples, ctx)
+    redundant = get_redundant(ctx, nb_inputs, T)
+    ns = { 'nb_steps': 1, 'solution': None }
+
+    evaluate = evaluate_stmt
+    if stats is not None:
+        get_depth = lambda vals_list: len(vals_list[0]) - nb_inputs + 1
+        evaluate = stats.instrument(evaluate, get_depth)
+
+    # the empty program evaluates to null
+    if [None] * len(examples) == outputs:
+        return Program(input_types, tuple()), ns['nb_steps']
+
+    def step():
+        ns['nb_steps'] += 1
+        return ns['nb_steps'] >= gas or (deadline is not None and deadline.expired())
 
-                if dfshelper(program, t + 1):
+    def match(results, d):
+        """Returns the statements that turn results into the outputs or None."""
+        chain = goals.get(get_goal_key(results))
+        if chain is None and all(isinstance(x, list) for x in results):
+            chain = goals.get(get_goal_key(results, True))
+        if chain is not None and len(chain) <= T - d:
+            return chain
+        return None
+
+    def extend(stmts, var, chain):
+        for f, lam in chain:
+            stmts += ((f, (var,) if lam is None else (lam, var)),)
+            var = nb_inputs + len(stmts) - 1
+        return Program(input_types, stmts)
+
+    def forward(stmts, vals, t, d, unused):
+        """Searches the programs of d statements that start with stmts."""
+        if stats is not None:
+            stats.nb_expansions += 1
+        candidates = iterate_stmts(input_types, stmts, ctx, stats,
+            leaf_functions if t + 1 == T else None, redundant)
+        for stmt in candidates:
+            child_unused = unused.difference(stmt[1]) | {nb_inputs + t}
+            if len(child_unused) - 1 > (d - t - 1) * (MAX_NB_VARIABLE_ARGS - 1):
+                if stats is not None:
+                    stats.prunes[search_stats.UNUSED] += 1
+                continue
+
+            try:
+                results = evaluate(stmt, vals)
+            except (NullInputError, OutputOutOfRangeError) as e:
+                if stats is not None:
+                    stats.add_error(e)
+                continue
+
+            stopped = step()
+            if t + 1 == d:
+                chain = match(results, d)
+                if chain is not None:
+                    ns['solution'] = extend(stmts + (stmt,), nb_inputs + t, chain)
                     return True
+            elif None in results:
+                if stats is not None:
+                    stats.prunes[search_stats.NULL_OUTPUT] += 1
+            elif forward(stmts + (stmt,), [x + [y] for x, y in zip(vals, results)], t + 1,
+                    d, child_unused):
+                return True
+            if stopped:
+                return True
 
-    dfshelper(p_base, 0)
+    # the outputs may be a few invertible statements from an input
+    for i in range(nb_inputs):
+        chain = match([x[i] for x in vals], 0)
+        stopped = step()
+        if chain:
+            return extend((), i, chain), ns['nb_steps']
+        if stopped:
+            return None, ns['nb_steps']
+
+    for d in range(1, T + 1):
+        if forward((), vals, 0, d, frozenset()):
+            break
     return ns['solution'], ns['nb_steps']
 
-def enumerate_helper(input_types, T, ctx, result_queue, stop_queue):
-    program_base = Program(input_types, [])
+# number of statements of the prefixes enumerate_programs splits its work by
+ENUMERATE_PREFIX_LEN = 2
 
-    monitor = {'stopped': False}
+def get_enumeration_root(input_types):
+    """Returns the node of the empty program for iterate_enumeration_stmts.
 
-    def helper(program_base, t):
-        if monitor['stopped']:
-            return
+    A node is a tuple of statements, their Program.code, dict of type -> tuple of
+    indices of the variables of that type and frozenset of indices of the variables
+    no statement uses.
+    """
+    type_to_vars = collections.defaultdict(tuple)
+    for i, input_type in enumerate(input_types):
+        type_to_vars[input_type] += (i,)
+    return (), (), dict(type_to_vars), frozenset(range(len(input_types)))
 
-        try:
-            stop_queue.get_nowait()
-            monitor['stopped'] = True
-            return
-        except queue.Empty:
-            pass
+def get_enumeration_child(node, stmt, nb_inputs):
+    """Returns the node of the program of node followed by stmt."""
+    stmts, code, type_to_vars, unused = node
+    f, args = stmt
+    index = nb_inputs + len(stmts)
+    type_to_vars = dict(type_to_vars)
+    type_to_vars[f.output_type] = type_to_vars.get(f.output_type, ()) + (index,)
+    return (stmts + (stmt,), code + encode_stmt(stmt), type_to_vars,
+            unused.difference(args) | {index})
 
-        if t == T:
-            if not get_unused_indices(program_base):
-                result_queue.put(program_base.prefix)
-            # don't keep searching if pruned
-            # has < T stmts. will get picked up
-            # on another enumeration
+def iterate_enumeration_stmts(node, T, ctx, redundant):
+    """Yields the next statements of a program in enumeration order that can still
+    lead to a program of T statements that uses every variable.
+
+    Args:
+        node: see get_enumeration_root
+        redundant: RedundantStmts to skip
+    """
+    stmts, _, type_to_vars, unused = node
+    # each statement left uses up to MAX_NB_VARIABLE_ARGS unused variables and adds
+    # itself, except the last one which is the output
+    max_unused = (T - len(stmts) - 1) * (MAX_NB_VARIABLE_ARGS - 1)
+    skipped = redundant.get(stmts)
+    for f in ctx.functions:
+        argslists = [ctx.typemap[x] if isinstance(x, types.FunctionType)
+                     else type_to_vars.get(x, ())
+                     for x in f.type.input_types]
+        for args in itertools.product(*argslists):
+            stmt = f, args
+            if stmt in skipped or stmt in stmts:
+                continue
+            if len(unused.difference(args)) > max_unused:
+                continue
+            yield stmt
+
+def get_enumeration_units(input_type_combinations, T, ctx):
+    """Splits the programs of enumerate_programs by input types and their first
+    statements.
+
+    Returns:
+        list of tuples of input types, statements. every program starts with the
+        statements of exactly one unit and the units are in enumeration order
+    """
+    units = []
+    prefix_len = max(min(ENUMERATE_PREFIX_LEN, T - 1), 0)
+    for input_types in input_type_combinations:
+        input_types = tuple(input_types)
+        redundant = get_redundant(ctx, len(input_types), T)
+
+        def helper(node):
+            if len(node[0]) == prefix_len:
+                units.append((input_types, node[0]))
+                return
+            for stmt in iterate_enumeration_stmts(node, T, ctx, redundant):
+                helper(get_enumeration_child(node, stmt, len(input_types)))
+
+        helper(get_enumeration_root(input_types))
+    return units
+
+def enumerate_unit(unit, T, ctx, max_nb_programs, fingerprints=None):
+    """Returns the codes of up to max_nb_programs programs of enumerate_programs that
+    start with the statements of unit in enumeration order.
+
+    Only statements that can still lead to a program that uses every variable are
+    generated, so no program is thrown out at the end.
+
+    Args:
+        unit: tuple of input types, statements. see get_enumeration_units
+        fingerprints (dict): if set, programs whose fingerprint (see dsl.fingerprint)
+            is already a key are skipped, and the others are added with their code
+    """
+    input_types, prefix = unit
+    nb_inputs = len(input_types)
+    redundant = get_redundant(ctx, nb_inputs, T)
+    codes = []
+
+    def add(code):
+        if fingerprints is not None:
+            key = fingerprint.get_fingerprint(Program.from_code(input_types, code))
+            if key in fingerprints:
+                return False
+            fingerprints[key] = code
+        codes.append(code)
+        return len(codes) >= max_nb_programs
+
+    def helper(node):
+        if len(node[0]) + 1 == T:
+            code = node[1]
+            for stmt in iterate_enumeration_stmts(node, T, ctx, redundant):
+                if add(code + encode_stmt(stmt)):
+                    return True
             return
 
-        type_to_inputs = collections.defaultdict(list)
-        for i, typ in enumerate(program_base.types):
-            type_to_inputs[typ].append(i)
+        for stmt in iterate_enumeration_stmts(node, T, ctx, redundant):
+            if helper(get_enumeration_child(node, stmt, nb_inputs)):
+                return True
 
-        for k, v in ctx.typemap.items():
-            type_to_inputs[k] += v
+    node = get_enumeration_root(input_types)
+    for stmt in prefix:
+        node = get_enumeration_child(node, stmt, nb_inputs)
+    if T > 0:
+        helper(node)
+    return codes
 
-        used = set(program_base.stmts)
-        for f in ctx.functions:
-            for args in iterate_inputs(f, type_to_inputs):
+# shared state of enumerate_programs worker processes
+_enumerate_worker = {}
 
-                stmt = f, args
-                if stmt in used:
-                    continue
+def _init_enumerate_worker(T, ctx, max_nb_programs, dedupe):
+    _enumerate_worker['args'] = T, ctx, max_nb_programs
+    _enumerate_worker['dedupe'] = dedupe
+
+def _enumerate_unit(unit):
+    """Returns a list of (fingerprint or None, code) of the programs of unit."""
+    if not _enumerate_worker['dedupe']:
+        return [(None, code) for code in enumerate_unit(unit, *_enumerate_worker['args'])]
+    fingerprints = {}
+    enumerate_unit(unit, *_enumerate_worker['args'], fingerprints=fingerprints)
+    return list(fingerprints.items())
+
+# units each process of iterate_programs is given ahead of the programs consumed
+ENUMERATE_UNITS_AHEAD = 2
+
+def iterate_programs(input_type_combinations, T, ctx, max_nb_programs=np.inf,
+        nb_workers=None, dedupe=False):
+    """Yields the programs of enumerate_programs one at a time.
+
+    Units are handed to the pool only ENUMERATE_UNITS_AHEAD per process ahead of the
+    unit being yielded, so memory doesn't grow with the number of programs, except
+    for the fingerprints kept with dedupe. Closing the generator stops the pool.
 
-                program = Program(program_base.input_types,
-                    list(program_base.stmts) + [stmt])
-                helper(program, t + 1)
+    Arguments:
+        see enumerate_programs. max_nb_programs defaults to np.inf (every program)
+    """
+    nb_workers = nb_workers or multiprocessing.cpu_count()
+    units = iter(get_enumeration_units(input_type_combinations, T, ctx))
+    seen = set()
+    nb_programs = 0
+    # (input types, AsyncResult) of the units handed out, in enumeration order
+    pending = collections.deque()
+    with multiprocessing.Pool(nb_workers, _init_enumerate_worker,
+            (T, ctx, max_nb_programs, dedupe)) as pool:
 
-    helper(program_base, 0)
-    result_queue.put(None) # done
-    if not monitor['stopped']:
-        stop_queue.get()
+        def submit():
+            nb_units = nb_workers * ENUMERATE_UNITS_AHEAD - len(pending)
+            for unit in itertools.islice(units, nb_units):
+                pending.append((unit[0], pool.apply_async(_enumerate_unit, (unit,))))
 
-def enumerate_programs(input_type_combinations, T, ctx, max_nb_programs):
+        submit()
+        while pending:
+            input_types, result = pending.popleft()
+            results = result.get()
+            submit()
+            for key, code in results:
+                if key is not None:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                yield Program.from_code(input_types, code)
+                nb_programs += 1
+                if nb_programs >= max_nb_programs:
+                    # the pool is terminated on exit
+                    return
+
+def enumerate_programs(input_type_combinations, T, ctx, max_nb_programs, nb_workers=None,
+        dedupe=False):
     """Enumerates programs with T statements that have the same input types.
 
     Each program is pruned and doesn't have any unused inputs or statements.
 
+    The programs are split into units by input types and first statements (see
+    get_enumeration_units) that a pool of processes takes one at a time. Programs
+    come back in enumeration order whatever the number of processes. Use
+    iterate_programs to get them without keeping them all in memory.
+
     Arguments:
         input_type_combinations (list): list of list of INT or LIST specifying all input types
             to search over
         T (int): number of statements in each outputted program
         ctx (Context): search context
         max_nb_programs (int): max number of programs to enumerate.
+        nb_workers (int): number of processes. default None (number of cpus)
+        dedupe (bool): only keep the first program of each fingerprint (see
+            dsl.fingerprint), so max_nb_programs counts distinct behaviors. default
+            False
 
     Returns:
-        set of programs with input types input_types and exactly T stmts.
+        list of the first max_nb_programs programs in enumeration order
     """
     programs = []
-
-    workers = []
-
-    result_queue = multiprocessing.Queue()
-    stop_queue = multiprocessing.Queue()
-
-    for input_types in input_type_combinations:
-        worker = multiprocessing.Process(target=enumerate_helper,
-            args=(input_types, T, ctx, result_queue, stop_queue))
-        worker.start()
-        workers.append(worker)
-
-    def join():
-        for worker in workers:
-            worker.join()
-
-    finished_cnt = 0
-    def all_done():
-        return finished_cnt == len(workers)
-
-    def stop_workers():
-        for _ in range(len(workers)):
-            stop_queue.put(1)
-
-    def wait_for_workers():
-        while True:
-            if not sum([worker.is_alive() for worker in workers]):
-                return
-            time.sleep(.1)
-
     with tqdm.tqdm(total=max_nb_programs) as pbar:
-        stopped = False
-        while not all_done():
-            if not stopped and len(programs) >= max_nb_programs:
-                stopped = True
-                stop_workers()
-
-            try:
-                result = result_queue.get_nowait()
-                if result is None:
-                    finished_cnt += 1
-                    continue
-
-                program = Program.parse(result)
-                if len(programs) < max_nb_programs:
-                    programs.append(program)
-                    pbar.update(1)
-            except queue.Empty:
-                continue
-    if not stopped:
-        stop_workers()
-    join()
+        for program in iterate_programs(input_type_combinations, T, ctx, max_nb_programs,
+                nb_workers, dedupe):
+            programs.append(program)
+            pbar.update()
     return programs
 
-
 def generate_contexts(final_ctx):
-    scores_map = {}
-    score = 0
-
     def _get_nearest_partner(f):
         """Returns the partner function to f with the highest score.
         If f is lambda, partner must be a regular function.
@@ -270,25 +1200,48 @@ def generate_contexts(final_ctx):
 
     partners = [_get_nearest_partner(x) for x, _ in final_ctx.items]
 
+    ctx = context.Context({})
     for i, (f, score) in enumerate(final_ctx.items):
         partner = partners[i]
-        if not partner or f in scores_map:
+        if not partner or f in ctx.scores_map:
             continue
 
-        scores_map[f] = score
+        added = {f: score}
+        if partner not in added and partner not in ctx.scores_map:
+            added[partner] = final_ctx.scores_map[partner]
 
-        if partner not in scores_map:
-            partner_score = final_ctx.scores_map[partner]
-            scores_map[partner] = partner_score
+        ctx = ctx.add(added)
+        yield ctx
 
-        yield context.Context(copy.copy(scores_map))
+def sort_and_add(examples, T, final_ctx, gas=np.inf, stats=None, deadline=None):
+    """Runs dfs on each context of generate_contexts until a solution is found.
 
-def sort_and_add(examples, T, final_ctx, gas=np.inf):
+    Each dfs only checks the programs that use a function or lambda added by its
+    context, since the others were checked by the earlier contexts.
+
+    Args:
+        examples: list of tuples of (inputs, output)
+        T: max depth
+        final_ctx: Context with every function and lambda to search over
+        gas (int): limit on number of steps of each dfs, where the programs searched
+            by earlier contexts it evaluates also count. default to np.inf (unlimited)
+        stats (SearchStats): if set, filled in with counters of all the searches
+        deadline (Deadline): if set, shared by every dfs. no later dfs is run once
+            it expires or is cancelled
+
+    Returns:
+        tuple of solution program, list of number of steps of each dfs
+    """
     solution = None
     nb_steps_list = []
+    # functions and lambdas of the previous context
+    searched = None
     for ctx in generate_contexts(final_ctx):
-        solution, nb_steps = dfs(examples, T, ctx, gas)
+        must_use = None if searched is None else set(ctx.scores_map) - searched
+        solution, nb_steps = dfs(examples, T, ctx, gas, stats=stats, must_use=must_use,
+            deadline=deadline)
         nb_steps_list.append(nb_steps)
-        if solution:
+        if solution or (deadline is not None and deadline.stopped):
             break
+        searched = set(ctx.scores_map)
     return solution, nb_steps_list
\ No newline at end of file
@@ -0,0 +1,75 @@
+import collections
+import time
+
+from deepcoder.dsl.function import Function, NullInputError
+
+# reasons a candidate statement is thrown out
+NULL_INPUT = 'null_input'
+OUT_OF_RANGE = 'out_of_range'
+NULL_OUTPUT = 'null_output'
+DUPLICATE = 'duplicate'
+EQUIVALENT = 'equivalent'
+UNUSED = 'unused'
+
+class SearchStats(object):
+    """Counters filled in by a search when passed as its stats argument."""
+
+    def __init__(self):
+        self.nb_expansions = 0
+        # reason -> number of candidate statements thrown out
+        self.prunes = collections.Counter()
+        # Function -> number of statements evaluated that use it
+        self.evaluations = collections.Counter()
+        # depth -> seconds spent evaluating statements at that depth
+        self.depth_times = collections.defaultdict(float)
+
+    def instrument(self, evaluate, get_depth):
+        """Wraps evaluate(stmt, vals) to count and time each call.
+
+        Args:
+            evaluate: function of statement, values of the program's variables
+            get_depth: function of the values to the depth of the new statement
+        Returns:
+            function with the same signature as evaluate
+        """
+        def wrapper(stmt, vals):
+            self.add_evaluation(stmt)
+            start = time.perf_counter()
+            try:
+                return evaluate(stmt, vals)
+            finally:
+                self.depth_times[get_depth(vals)] += time.perf_counter() - start
+        return wrapper
+
+    def add_evaluation(self, stmt):
+        f, args = stmt
+        self.evaluations[f] += 1
+        for x in args:
+            if isinstance(x, Function):
+                self.evaluations[x] += 1
+
+    def add_error(self, error):
+        """Counts a statement thrown out because evaluating it raised error."""
+        if isinstance(error, NullInputError):
+            self.prunes[NULL_INPUT] += 1
+        else:
+            self.prunes[OUT_OF_RANGE] += 1
+
+    def merge(self, other):
+        """Adds the counters of other to this."""
+        self.nb_expansions += other.nb_expansions
+        self.prunes.update(other.prunes)
+        self.evaluations.update(other.evaluations)
+        for depth, seconds in other.depth_times.items():
+            self.depth_times[depth] += seconds
+
+    def to_dict(self):
+        """Returns a flat dict of the counters, e.g. for a DataFrame row."""
+        row = collections.OrderedDict([('nb_expansions', self.nb_expansions)])
+        for reason, count in sorted(self.prunes.items()):
+            row['prune_' + reason] = count
+        for f, count in sorted(self.evaluations.items(), key=lambda x: x[0].name):
+            row['eval_' + f.name] = count
+        for depth, seconds in sorted(self.depth_times.items()):
+            row['depth{}_ms'.format(depth)] = seconds * 1000
+        return row
@@ -5,7 +5,7 @@ set -i
 
 PROG_LENS=(1 2 3 4 5)
 #PROG_LENS=(1 2)
-MODES=("dfs" "sort-and-add")
+MODES=("dfs" "sort-and-add" "bottom-up" "best-first")
 GAS=1000000
 #GAS=10000000
 
@@ -14,6 +14,8 @@ for PROG_LEN in ${PROG_LENS[*]}; do
 
         PROBLEM_FILE="programs_T=${PROG_LEN}_test.jsonl"
         RESULT_FILE="T=${PROG_LEN}_mode=${MODE}_predictor=None_gas=${GAS}.h5"
+        # rows are streamed here so an interrupted run picks up where it stopped
+        ROWS_FILE="${RESULT_FILE%.h5}.jsonl"
 
         gsutil cp gs://deepcoder/datasets/$PROBLEM_FILE $PROBLEM_FILE
 
@@ -22,7 +24,9 @@ for PROG_LEN in ${PROG_LENS[*]}; do
             --outfile $RESULT_FILE \
             --T $PROG_LEN \
             --mode $MODE \
-            --gas $GAS
+            --gas $GAS \
+            --results $ROWS_FILE \
+            --resume
 
         gsutil cp $RESULT_FILE gs://deepcoder/results/$RESULT_FILE
         rm -f $RESULT_FILE $PROBLEM_FILE
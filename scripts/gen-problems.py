@@ -12,6 +12,8 @@ def main():
     parser.add_argument('--infile', type=str)
     parser.add_argument('--outfile', type=str)
     parser.add_argument('--nb_examples', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0,
+        help='examples of each program are drawn from this seed and its prefix')
     args = parser.parse_args()
 
     with open(args.infile) as in_fh:
@@ -21,10 +23,12 @@ def main():
     for program in tqdm.tqdm(programs, total=len(programs)):
         problem = {}
         examples = None
+        rng = constraint.get_program_rng(program, args.seed)
         # only try twice for speed
         for _ in range(2):
             try:
-                examples = constraint.get_input_output_examples(program, args.nb_examples)
+                examples = constraint.get_input_output_examples(program, args.nb_examples,
+                    rng=rng)
             # TODO: figure out why OutputOutOfRange happened here in T=4 generation
             except (NullInputError, constraint.InvalidConstraintError, constraint.OutputOutOfRangeError):
                 continue
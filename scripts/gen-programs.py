@@ -6,11 +6,13 @@ import tqdm
 
 from deepcoder.context import Context
 from deepcoder.dsl import constraint
+from deepcoder.dsl import fingerprint
 from deepcoder.dsl import impl
 from deepcoder.dsl.function import OutputOutOfRangeError, NullInputError
 from deepcoder.dsl.program import prune, Program
 from deepcoder.dsl.types import INT, LIST
-from deepcoder.search import enumerate_programs
+from deepcoder.sampler import count_programs, sample_programs
+from deepcoder.search import iterate_programs
 
 def get_input_type_combinations(nb_inputs):
     input_type_combinations = []
@@ -29,6 +31,35 @@ def is_disjoint(program, others):
             return False
     return True
 
+def stream_split(programs, nb_test, train_fh):
+    """Writes programs to train_fh as they come and keeps nb_test of them for test.
+
+    Test programs are a reservoir sample, so every program is as likely to be picked
+    as after a shuffle but only nb_test programs are kept in memory. Like the split of
+    the whole list, at most half of the programs are picked.
+
+    Returns:
+        list of test programs and number of train programs written
+    """
+    test_programs = []
+    nb_train = 0
+    for i, program in enumerate(programs):
+        if i < nb_test:
+            test_programs.append(program)
+            continue
+        j = random.randint(0, i)
+        if j < nb_test:
+            test_programs[j], program = program, test_programs[j]
+        train_fh.write(program.prefix + '\n')
+        nb_train += 1
+
+    nb_programs = nb_train + len(test_programs)
+    random.shuffle(test_programs)
+    for program in test_programs[nb_programs // 2:]:
+        train_fh.write(program.prefix + '\n')
+        nb_train += 1
+    return test_programs[:nb_programs // 2], nb_train
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--nb_inputs', type=int)
@@ -38,14 +69,50 @@ def main():
     parser.add_argument('--train_out', type=str)
     parser.add_argument('--test_out', type=str)
     parser.add_argument('--enforce_disjoint', action='store_true')
+    parser.add_argument('--dedupe', action='store_true',
+        help='enumerate one program per behavior on the fingerprint input bank')
+    parser.add_argument('--nb_workers', type=int,
+        help='number of processes enumerating programs. default number of cpus')
+    parser.add_argument('--stream', action='store_true',
+        help='write train programs while they are enumerated instead of keeping them in '
+        'memory. train programs are written unsorted')
+    parser.add_argument('--sample', action='store_true',
+        help='sample programs uniformly instead of taking the first ones enumerated')
+    parser.add_argument('--seed', type=int, help='seed of --sample')
     args = parser.parse_args()
+    if args.stream and args.enforce_disjoint:
+        parser.error('--enforce_disjoint keeps every program in memory. use --dedupe with '
+            '--stream, programs with different fingerprints are never the same')
 
     ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
 
     input_type_combinations = get_input_type_combinations(args.nb_inputs)
 
-    programs = enumerate_programs(input_type_combinations, args.prog_len,
-        ctx, args.nb_train + args.nb_test)
+    # upper bound of the number of programs there are
+    nb_programs = count_programs(input_type_combinations, args.prog_len, ctx)
+    print('at most {} programs'.format(nb_programs))
+    if args.sample:
+        if args.nb_train + args.nb_test > nb_programs // 2:
+            parser.error('--sample is for drawing a fraction of the programs. enumerate '
+                'them instead')
+        programs = sample_programs(input_type_combinations, args.prog_len, ctx,
+            args.nb_train + args.nb_test, args.seed, args.dedupe)
+    else:
+        programs = iterate_programs(input_type_combinations, args.prog_len, ctx,
+            args.nb_train + args.nb_test, args.nb_workers, args.dedupe)
+    programs = tqdm.tqdm(programs, total=min(args.nb_train + args.nb_test, nb_programs))
+
+    if args.stream:
+        with open(args.train_out, 'w') as fh:
+            test_programs, nb_train = stream_split(programs, args.nb_test, fh)
+        print('wrote ', args.train_out, '({} programs)'.format(nb_train))
+        print('writing ', args.test_out, '({} programs)'.format(len(test_programs)))
+        with open(args.test_out, 'w') as fh:
+            for program in sorted(test_programs):
+                fh.write(program.prefix + '\n')
+        return
+
+    programs = list(programs)
 
     # train / test split
     random.shuffle(programs)
@@ -55,6 +122,10 @@ def main():
 
     if args.enforce_disjoint:
         train_programs = set(programs)
+        # only programs with the same fingerprint can be the same
+        index = fingerprint.FingerprintIndex()
+        for program in tqdm.tqdm(programs, desc='fingerprints'):
+            index.add(program)
         test_programs = []
         for program in tqdm.tqdm(programs, total=args.nb_test):
             input_output_examples = None
@@ -69,8 +140,9 @@ def main():
                 continue
 
             same_programs = set()
-            for train_program in train_programs:
-                if constraint.is_same(program, train_program, input_output_examples):
+            for train_program in index.get(program):
+                if (train_program in train_programs and
+                        constraint.is_same(program, train_program, input_output_examples)):
                     same_programs.add(train_program)
 
             test_programs.append(program)
@@ -79,7 +151,7 @@ def main():
             if len(test_programs) == args.nb_test:
                 break
     else:
-        train_programs = programs[args.nb_train]
+        train_programs = programs[:args.nb_train]
         test_programs = programs[args.nb_train:args.nb_train + args.nb_test]
 
     train_outfile = args.train_out
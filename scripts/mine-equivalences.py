@@ -0,0 +1,20 @@
+import argparse
+
+from deepcoder.dsl import equivalence
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--outfile', type=str, default=equivalence.TABLE_PATH)
+    parser.add_argument('--nb_samples', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    table = equivalence.mine(nb_samples=args.nb_samples, seed=args.seed)
+    nb_pairs = len([x for x in table if len(x) == 3])
+    print('found {} statements and {} pairs of statements with smaller equivalents'.format(
+        len(table) - nb_pairs, nb_pairs))
+    print('saving table to', args.outfile)
+    equivalence.save(table, args.outfile)
+
+if __name__ == '__main__':
+    main()
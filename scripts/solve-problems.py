@@ -1,56 +1,320 @@
 import argparse
 import collections
 import functools
-import concurrent.futures
+import multiprocessing
+import os
+import tempfile
 import time
 import json
 import numpy as np
 import pandas as pd
 import tqdm
 
+from deepcoder import cache as solution_cache
 from deepcoder import context
+from deepcoder import deadline as search_deadline
 from deepcoder import search
+from deepcoder import stats as search_stats
 from deepcoder import util
-from deepcoder.nn import model
 from deepcoder.dsl import impl
 from deepcoder.dsl.program import Program
 
-def solve_problem(problem, T, mode='dfs', gas=np.inf):
+def solve_problem(problem, T, mode='dfs', gas=np.inf, beam_width=1000, collect_stats=False,
+        timeout_ms=None):
     examples = [util.decode_example(x) for x in problem['examples']]
     predictions = problem.get('prediction', np.zeros(len(impl.FUNCTIONS)))
     scores = dict(zip(impl.FUNCTIONS, predictions))
     ctx = context.Context(scores)
+    stats = search_stats.SearchStats() if collect_stats else None
+    deadline = search_deadline.Deadline(timeout_ms) if timeout_ms is not None else None
     start = time.time()
-    if mode == 'dfs':
-        search_func = search.dfs
-    elif mode == 'sort-and-add':
-        search_func = search.sort_and_add
+    # only set for parallel-dfs
+    is_dfs_solution = None
+    if mode == 'parallel-dfs':
+        solution, steps_used, is_dfs_solution = search.parallel_dfs(examples, T, ctx, gas,
+            stats=stats, deadline=deadline)
     else:
-        raise ValueError('invalid search mode {}'.format(mode))
-    solution, steps_used = search_func(examples, T, ctx, gas)
+        if mode == 'dfs':
+            search_func = search.dfs
+        elif mode == 'sort-and-add':
+            search_func = search.sort_and_add
+        elif mode == 'bottom-up':
+            search_func = search.bottom_up
+        elif mode == 'bidirectional':
+            search_func = search.bidirectional
+        elif mode == 'best-first':
+            search_func = search.best_first
+        elif mode == 'beam':
+            search_func = functools.partial(search.best_first, beam_width=beam_width)
+        else:
+            raise ValueError('invalid search mode {}'.format(mode))
+        solution, steps_used = search_func(examples, T, ctx, gas, stats=stats,
+            deadline=deadline)
     end = time.time()
     if solution:
         solution = solution.prefix
-    return solution, end - start, steps_used
+    timed_out = deadline.timed_out if deadline is not None else None
+    # the searches stop once their steps reach gas, so fewer steps means every
+    # program was searched. the dfs of sort-and-add also spend gas on programs an
+    # earlier context searched, so only unlimited gas tells there
+    if mode == 'sort-and-add':
+        exhausted = gas == np.inf
+    else:
+        exhausted = np.sum(steps_used) < gas
+    exhausted = solution is None and not timed_out and bool(exhausted)
+    return solution, end - start, steps_used, is_dfs_solution, stats, timed_out, exhausted
 
-def solve_problems(problems, T, mode='dfs', gas=np.inf):
-    rows = []
-    pbar = tqdm.tqdm(total=len(problems))
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        futs = [executor.submit(solve_problem, problem, T, mode, gas) 
-                for problem in problems]
-        for fut, problem in zip(futs, problems):
-            solution, walltime, steps_used = fut.result()
-            rows.append(collections.OrderedDict([
-                ('nb_steps', steps_used),
-                ('wall_ms', walltime * 1000),
-                ('solution', solution),
-                ('reference', problem['program']),
-            ]))
-            pbar.update(1)
+# largest number of problems sent to a worker at once
+MAX_CHUNK_SIZE = 64
+
+# state of solve_problems worker processes
+_worker = {}
+
+def _init_worker(path, settings):
+    """Loads the problems written by write_payload once per worker.
+
+    Args:
+        settings: arguments of solve_problem after the problem
+    """
+    with open(os.path.join(path, 'problems.json')) as f:
+        _worker['problems'] = json.load(f)
+    _worker['predictions'] = np.load(os.path.join(path, 'predictions.npy'), mmap_mode='r')
+    _worker['settings'] = settings
+
+def _solve_payload_chunk(indices):
+    """Returns a list of (index, result of solve_problem) for the problems at indices
+    of the payload."""
+    results = []
+    for i in indices:
+        problem = dict(_worker['problems'][i], prediction=_worker['predictions'][i])
+        results.append((i, solve_problem(problem, *_worker['settings'])))
+    return results
+
+def write_payload(problems, path):
+    """Writes problems to the directory path for _init_worker. The predictions are
+    stacked into an array that the workers memory-map."""
+    with open(os.path.join(path, 'problems.json'), 'w') as f:
+        json.dump([{k: v for k, v in problem.items() if k != 'prediction'}
+                   for problem in problems], f)
+    predictions = np.array([problem.get('prediction', np.zeros(len(impl.FUNCTIONS)))
+                            for problem in problems], dtype=np.float64)
+    np.save(os.path.join(path, 'predictions.npy'), predictions)
+
+def estimate_cost(problem):
+    """Returns a guess of the time it takes to solve problem. Only comparable between
+    problems of the same T.
+
+    Longer inputs make every statement slower to evaluate, and the flatter the
+    predictions, the more functions the search tries before the right ones.
+    """
+    size = sum(len(x) if isinstance(x, list) else 1
+               for example in problem['examples'] for x in example['inputs'])
+    prediction = problem.get('prediction')
+    if prediction is None:
+        return float(size)
+    p = np.clip(np.asarray(prediction, dtype=np.float64), 1e-6, None)
+    p /= p.sum()
+    # perplexity, the effective number of functions
+    return size * np.exp(-np.sum(p * np.log(p)))
+
+def get_chunks(costs, nb_chunks, max_size=MAX_CHUNK_SIZE):
+    """Splits range(len(costs)) in order into chunks of up to max_size indices whose
+    costs add up to at most sum(costs) / nb_chunks, or of a single index."""
+    limit = sum(costs) / nb_chunks
+    chunks = [[]]
+    total = 0.
+    for i, cost in enumerate(costs):
+        if chunks[-1] and (total + cost > limit or len(chunks[-1]) == max_size):
+            chunks.append([])
+            total = 0.
+        chunks[-1].append(i)
+        total += cost
+    return chunks
+
+def get_problem_key(problem, T, mode, beam_width):
+    """Returns the keys of problem in a SolutionCache."""
+    examples = [util.decode_example(x) for x in problem['examples']]
+    predictions = problem.get('prediction', np.zeros(len(impl.FUNCTIONS)))
+    return (solution_cache.get_examples_key(examples, T),
+        solution_cache.get_search_key(mode, predictions,
+            beam_width if mode == 'beam' else None))
+
+def get_row(index, problem, result, cached=None, split=None):
+    solution, walltime, steps_used, is_dfs_solution, stats, timed_out, _ = result
+    row = collections.OrderedDict([
+        ('problem', index),
+        ('nb_steps', steps_used),
+        ('wall_ms', walltime * 1000),
+        ('solution', solution),
+        ('reference', problem['program']),
+    ])
+    if cached is not None:
+        row['cached'] = cached
+    if split is not None:
+        row['split'] = split
+    if timed_out is not None:
+        row['timed_out'] = timed_out
+    if is_dfs_solution is not None:
+        row['is_dfs_solution'] = is_dfs_solution
+    if stats is not None:
+        row.update(stats.to_dict())
+    return row
+
+def solve_problems(problems, T, mode='dfs', gas=np.inf, beam_width=1000,
+        collect_stats=False, cache=None, skip=(), timeout_ms=None, nb_workers=None,
+        chunk_size=None, max_tasks_per_child=None, costs=None, split_after_ms=None):
+    """Yields a row of results per problem in the order the problems are solved.
+
+    Problems are sent to the workers in chunks of indices into a payload each worker
+    loads once, so small problems aren't dominated by pickling and IPC. The problems
+    expected to take longest go first, so the last ones to finish are short.
+
+    Args:
+        skip: indices of problems not to solve, e.g. ones already in a results file
+        timeout_ms: if set, wall-clock limit of each search
+        nb_workers: number of processes. default None (number of cpus)
+        chunk_size: number of problems per task. default None (enough chunks to
+            keep each worker busy with 4, up to MAX_CHUNK_SIZE problems each)
+        max_tasks_per_child: if set, workers are replaced after this many chunks
+        costs: dict of problem index -> cost, e.g. nb_steps of an earlier run. used
+            to order the problems instead of estimate_cost
+        split_after_ms: if set and mode is dfs, searches still running after this
+            long are stopped and run again with parallel-dfs once the others are
+            done, so the cores left idle by the last problems share their search.
+            the rerun gets what is left of timeout_ms and its row counts the time
+            of both searches
+    """
+    # duplicate problems are only solved once
+    key_to_indices = collections.OrderedDict()
+    for i, problem in enumerate(problems):
+        if i not in skip:
+            key = get_problem_key(problem, T, mode, beam_width)
+            key_to_indices.setdefault(key, []).append(i)
+
+    todo = []
+    for key, indices in key_to_indices.items():
+        cached = cache.get(*key, gas) if cache is not None else None
+        if cached is None:
+            todo.append(key)
+            continue
+        solution, steps_used = cached
+        timed_out = False if timeout_ms is not None else None
+        # no steps when the solution was found by another search
+        is_cached = 'other' if steps_used is None else True
+        for i in indices:
+            yield get_row(i, problems[i],
+                (solution, 0., steps_used, None, None, timed_out, False), is_cached)
+
+    # longest expected first
+    if costs:
+        default_cost = np.mean(list(costs.values()))
+        get_cost = lambda key: costs.get(key_to_indices[key][0], default_cost)
+    else:
+        get_cost = lambda key: estimate_cost(problems[key_to_indices[key][0]])
+    todo_costs = {key: get_cost(key) for key in todo}
+    todo.sort(key=lambda key: -todo_costs[key])
+
+    split = (split_after_ms is not None and mode == 'dfs' and
+             (timeout_ms is None or split_after_ms < timeout_ms))
+    settings = (T, mode, gas, beam_width, collect_stats,
+                split_after_ms if split else timeout_ms)
+
+    def finish(key, result, is_split):
+        # a failure that timed out says nothing about the gas it was given
+        if cache is not None and not (result[0] is None and result[5]):
+            cache_key = key
+            if is_split:
+                # parallel-dfs branches share the gas, so its failures are only
+                # failures of parallel-dfs
+                cache_key = key[0], get_problem_key(problems[key_to_indices[key][0]], T,
+                    'parallel-dfs', beam_width)[1]
+            cache.put(*cache_key, gas, result[0], result[2], result[6])
+        for i in key_to_indices[key]:
+            yield get_row(i, problems[i], result, False if cache is not None else None,
+                is_split if split else None)
+        pbar.update(1)
+
+    pbar = tqdm.tqdm(total=len(todo))
+    to_split = []
+    for j, result in _solve_todo([problems[key_to_indices[key][0]] for key in todo],
+            [todo_costs[key] for key in todo], settings, nb_workers, chunk_size,
+            max_tasks_per_child):
+        if split and result[0] is None and result[5]:
+            to_split.append((todo[j], result))
+        else:
+            yield from finish(todo[j], result, False)
+    for key, first in to_split:
+        remaining_ms = None if timeout_ms is None else timeout_ms - first[1] * 1000
+        if remaining_ms is not None and remaining_ms <= 0:
+            yield from finish(key, first, False)
+            continue
+        # each search already uses every core
+        result = solve_problem(problems[key_to_indices[key][0]], T, 'parallel-dfs', gas,
+            beam_width, collect_stats, remaining_ms)
+        yield from finish(key, (result[0], first[1] + result[1]) + result[2:], True)
     pbar.close()
+
+def _solve_todo(problems, costs, settings, nb_workers, chunk_size, max_tasks_per_child):
+    """Yields (index, result of solve_problem) for each of problems as it's solved.
+
+    Args:
+        costs: expected cost of each problem. without chunk_size, chunks are made
+            of about equal cost
+    """
+    if not problems:
+        return
+    if settings[1] == 'parallel-dfs':
+        # each problem already uses every core
+        for i, problem in enumerate(problems):
+            yield i, solve_problem(problem, *settings)
+        return
+
+    nb_workers = nb_workers or os.cpu_count()
+    if chunk_size is None:
+        chunks = get_chunks(costs, nb_workers * 4)
+    else:
+        chunks = [range(start, min(start + chunk_size, len(problems)))
+                  for start in range(0, len(problems), chunk_size)]
+    with tempfile.TemporaryDirectory() as path:
+        write_payload(problems, path)
+        # a Pool rather than a ProcessPoolExecutor, whose max_tasks_per_child can hang
+        # on python 3.11
+        with multiprocessing.Pool(nb_workers, _init_worker, (path, settings),
+                max_tasks_per_child) as pool:
+            # a slow chunk doesn't hold back the ones after it
+            for results in pool.imap_unordered(_solve_payload_chunk, chunks):
+                yield from results
+
+def load_results(path):
+    """Returns the rows of a results file written by main.
+
+    A line cut off by an interrupted run is dropped, keeping the rows after it,
+    and the file is rewritten without it and ending in a newline, so rows can be
+    appended again.
+    """
+    rows = []
+    try:
+        with open(path) as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return rows
+    for line in lines:
+        try:
+            rows.append(json.loads(line, object_pairs_hook=collections.OrderedDict))
+        except ValueError:
+            continue
+    if len(rows) < len(lines) or (lines and not lines[-1].endswith('\n')):
+        with open(path, 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
     return rows
 
+def _to_json(x):
+    # numpy scalars from the searches
+    if isinstance(x, np.generic):
+        return x.item()
+    raise TypeError('{} is not JSON serializable'.format(type(x)))
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('problemfile', type=str)
@@ -58,16 +322,45 @@ def main():
     parser.add_argument('--outfile', type=str)
     parser.add_argument('--T', type=int)
     parser.add_argument('--mode', type=str, 
-        choices=['dfs', 'sort-and-add'],
+        choices=['dfs', 'sort-and-add', 'bottom-up', 'best-first', 'beam',
+            'parallel-dfs', 'bidirectional'],
         default='dfs')
     parser.add_argument('--gas', type=int, default=np.inf)
+    parser.add_argument('--timeout_ms', type=float,
+        help='wall-clock limit of each search. default unlimited')
+    parser.add_argument('--beam_width', type=int, default=1000)
+    parser.add_argument('--stats', action='store_true')
+    parser.add_argument('--cache', type=str,
+        help='sqlite file of solutions and failures to reuse across runs')
+    parser.add_argument('--results', type=str,
+        help='jsonl file that each row is appended to as its problem is solved')
+    parser.add_argument('--resume', action='store_true',
+        help='skip the problems already in --results')
+    parser.add_argument('--nb_workers', type=int,
+        help='number of processes. default number of cpus')
+    parser.add_argument('--chunk_size', type=int,
+        help='number of problems sent to a worker at once. default based on the '
+             'number of problems')
+    parser.add_argument('--max_tasks_per_child', type=int,
+        help='chunks a worker solves before it is replaced. default unlimited')
+    parser.add_argument('--costs_from', type=str,
+        help='results jsonl of an earlier run on the same problems whose nb_steps '
+             'order the problems, longest first. default estimated from the problems')
+    parser.add_argument('--split_after_ms', type=float,
+        help='dfs only. searches running longer are finished with parallel-dfs after '
+             'the others')
+    parser.add_argument('--flush_secs', type=float, default=10.,
+        help='seconds between flushes of --results')
     args = parser.parse_args()
+    if args.resume and not args.results:
+        parser.error('--resume requires --results')
 
     problems = json.loads(open(args.problemfile).read())
 
     if args.predictor:
         # annotate problems with predictions
         import keras
+        from deepcoder.nn import model
         predictor = keras.models.load_model(args.predictor)
         max_nb_inputs = model.get_max_nb_inputs(predictor)
         X, _ = model.get_XY(problems, max_nb_inputs)
@@ -75,9 +368,35 @@ def main():
         for problem, pred in zip(problems, predictions):
             problem['prediction'] = pred
 
-    rows = solve_problems(problems, args.T, args.mode, args.gas)
+    rows = load_results(args.results) if args.resume else []
+    if rows:
+        print('resuming with {} problems done'.format(len(rows)))
+    skip = set(row['problem'] for row in rows)
+
+    costs = None
+    if args.costs_from:
+        costs = {row['problem']: float(np.sum(row['nb_steps']))
+                 for row in load_results(args.costs_from) if row['nb_steps'] is not None}
+
+    cache = solution_cache.SolutionCache(args.cache) if args.cache else None
+    solved = solve_problems(problems, args.T, args.mode, args.gas, args.beam_width,
+        args.stats, cache, skip, args.timeout_ms, args.nb_workers, args.chunk_size,
+        args.max_tasks_per_child, costs, args.split_after_ms)
+    if args.results:
+        with open(args.results, 'a' if args.resume else 'w') as f:
+            last_flush = time.time()
+            for row in solved:
+                rows.append(row)
+                f.write(json.dumps(row, default=_to_json) + '\n')
+                if time.time() - last_flush > args.flush_secs:
+                    f.flush()
+                    last_flush = time.time()
+    else:
+        rows.extend(solved)
+    if cache is not None:
+        cache.close()
 
-    df = pd.DataFrame(rows)
+    df = pd.DataFrame(rows).sort_values('problem').set_index('problem')
     nb_solved = len(df) - sum(df.solution.isnull())
     print('summary:')
     print('solved {}/{} ({}%)'.format(nb_solved, len(df), nb_solved * 100. / len(df)))
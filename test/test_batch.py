@@ -0,0 +1,73 @@
+import unittest
+
+from deepcoder.dsl import batch
+from deepcoder.dsl import constraint
+from deepcoder.dsl import impl
+from deepcoder.dsl.function import OutputOutOfRangeError, NullInputError
+from deepcoder.dsl.program import Program
+from deepcoder.dsl.value import IntValue, ListValue, NULLVALUE
+
+def to_batch(*values):
+    return batch.Batch.from_values(list(values))
+
+class TestBatch(unittest.TestCase):
+    def test_roundtrip(self):
+        values = [ListValue([1, 2, 3]), ListValue([]), ListValue([-4])]
+        self.assertEqual(to_batch(*values).to_values(), values)
+
+        values = [IntValue(3), NULLVALUE]
+        self.assertEqual(to_batch(*values).to_values(), values)
+
+    def test_impl(self):
+        xs = to_batch(ListValue([1, 2, 3]), ListValue([-3, 5]), ListValue([]))
+        self.assertEqual(batch.call(impl.MAP, impl.TIMES2, xs),
+            to_batch(ListValue([2, 4, 6]), ListValue([-6, 10]), ListValue([])))
+        self.assertEqual(batch.call(impl.FILTER, impl.ODD, xs),
+            to_batch(ListValue([1, 3]), ListValue([-3, 5]), ListValue([])))
+        self.assertEqual(batch.call(impl.COUNT, impl.EVEN, xs),
+            to_batch(IntValue(1), IntValue(0), IntValue(0)))
+        self.assertEqual(batch.call(impl.MAXIMUM, xs),
+            to_batch(IntValue(3), IntValue(5), NULLVALUE))
+        self.assertEqual(batch.call(impl.REVERSE, xs),
+            to_batch(ListValue([3, 2, 1]), ListValue([5, -3]), ListValue([])))
+        self.assertEqual(batch.call(impl.SCAN1L, impl.LMINUS, xs),
+            to_batch(ListValue([1, -1, -4]), ListValue([-3, -8]), ListValue([])))
+
+        ns = to_batch(IntValue(1), IntValue(-1), IntValue(4))
+        self.assertEqual(batch.call(impl.DROP, ns, xs),
+            to_batch(ListValue([2, 3]), ListValue([5]), ListValue([])))
+        self.assertEqual(batch.call(impl.ACCESS, ns, xs),
+            to_batch(IntValue(2), NULLVALUE, NULLVALUE))
+
+        ys = to_batch(ListValue([1, 1]), ListValue([2, 2, 2]), ListValue([7]))
+        self.assertEqual(batch.call(impl.ZIPWITH, impl.LMAX, xs, ys),
+            to_batch(ListValue([1, 2]), ListValue([2, 5]), ListValue([])))
+
+    def test_errors(self):
+        xs = to_batch(ListValue([1, 2]), ListValue([200]))
+        self.assertRaises(OutputOutOfRangeError, batch.call, impl.MAP, impl.TIMES2, xs)
+
+        ns = to_batch(IntValue(1), NULLVALUE)
+        self.assertRaises(NullInputError, batch.call, impl.TAKE, ns, xs)
+
+    def test_run(self):
+        program = Program.parse('LIST|INT|FILTER,<0,0|SORT,2|REVERSE,3|ACCESS,1,4')
+        inputs_list = [
+            [ListValue([1, -5, -3, -4, -2, -1, 2, 3]), IntValue(1)],
+            [ListValue([-1, 2]), IntValue(3)],
+        ]
+        expected = [program(*inputs) for inputs in inputs_list]
+        actual = batch.run(program, batch.from_inputs(inputs_list)).to_values()
+        self.assertEqual(actual, expected)
+
+    def test_is_same(self):
+        lhs = Program.parse('LIST|MAXIMUM,0')
+        rhs = Program.parse('LIST|SCAN1L,max,0|MAXIMUM,1')
+        self.assertTrue(constraint.is_same(lhs, rhs, batched=True))
+
+        rhs = Program.parse('LIST|SCAN1L,min,0|MAXIMUM,1')
+        examples = [([ListValue([1, 3])], IntValue(3))]
+        self.assertFalse(constraint.is_same(lhs, rhs, examples, batched=True))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from deepcoder.cache import SolutionCache, get_examples_key, get_search_key
+from deepcoder.dsl import impl
+from deepcoder.dsl.value import IntValue, ListValue
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'cache.sqlite')
+        self.examples = [
+            ([ListValue([1,2,3])], IntValue(6)),
+            ([ListValue([4,-1])], IntValue(3)),
+        ]
+        self.dfs = get_search_key('dfs', np.zeros(len(impl.FUNCTIONS)))
+        self.bottom_up = get_search_key('bottom-up', np.zeros(len(impl.FUNCTIONS)))
+        self.parallel_dfs = get_search_key('parallel-dfs', np.zeros(len(impl.FUNCTIONS)))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_keys(self):
+        key = get_examples_key(self.examples, 3)
+        self.assertEqual(key, get_examples_key(list(reversed(self.examples)), 3))
+        self.assertNotEqual(key, get_examples_key(self.examples, 2))
+        self.assertNotEqual(key, get_examples_key(self.examples[:1], 3))
+        self.assertNotEqual(self.dfs, self.bottom_up)
+        self.assertNotEqual(self.dfs, get_search_key('dfs', np.ones(len(impl.FUNCTIONS))))
+
+    def test_failure(self):
+        key = get_examples_key(self.examples, 3)
+        cache = SolutionCache(self.path)
+        self.assertIsNone(cache.get(key, self.dfs, 100))
+        cache.put(key, self.dfs, 100, None, 100)
+        self.assertEqual(cache.get(key, self.dfs, 100), (None, 100))
+        self.assertEqual(cache.get(key, self.dfs, 10), (None, 10))
+        # more gas or another search has to run
+        self.assertIsNone(cache.get(key, self.dfs, 1000))
+        self.assertIsNone(cache.get(key, self.bottom_up, 100))
+
+        # less gas doesn't overwrite
+        cache.put(key, self.dfs, 10, None, 10)
+        self.assertEqual(cache.get(key, self.dfs, 100), (None, 100))
+
+        # fewer steps than gas alone doesn't mean every program was searched, e.g.
+        # sort-and-add spends gas on programs it doesn't count as steps
+        cache.put(key, self.dfs, 1000, None, 500)
+        self.assertEqual(cache.get(key, self.dfs, 1000), (None, 500))
+        self.assertIsNone(cache.get(key, self.dfs, np.inf))
+
+        # ran out of programs
+        cache.put(key, self.dfs, 1000, None, 500, exhausted=True)
+        self.assertEqual(cache.get(key, self.dfs, np.inf), (None, 500))
+        cache.close()
+
+    def test_failure_of_other_search(self):
+        key = get_examples_key(self.examples, 3)
+        cache = SolutionCache(self.path)
+        # parallel-dfs shares its gas between branches, so dfs may still succeed
+        cache.put(key, self.parallel_dfs, 100, None, 100)
+        self.assertEqual(cache.get(key, self.parallel_dfs, 100), (None, 100))
+        self.assertIsNone(cache.get(key, self.dfs, 100))
+        self.assertIsNone(cache.get(key, self.dfs, 10))
+
+        # nor does a search that ran out of programs answer another search
+        cache.put(key, self.bottom_up, 1000, None, 500, exhausted=True)
+        self.assertEqual(cache.get(key, self.bottom_up, np.inf), (None, 500))
+        self.assertIsNone(cache.get(key, self.dfs, 100))
+        cache.close()
+
+    def test_solution(self):
+        key = get_examples_key(self.examples, 3)
+        cache = SolutionCache(self.path)
+        cache.put(key, self.bottom_up, np.inf, 'LIST|SUM,0', [3, 4])
+        cache.close()
+
+        cache = SolutionCache(self.path)
+        self.assertEqual(cache.get(key, self.bottom_up, 100), ('LIST|SUM,0', [3, 4]))
+        self.assertIsNone(cache.get(get_examples_key(self.examples, 2), self.dfs, 100))
+        # the steps of another search don't answer this one
+        self.assertEqual(cache.get(key, self.dfs, 100), ('LIST|SUM,0', None))
+
+        # nor are they replaced by its solution
+        cache.put(key, self.dfs, 100, 'LIST|SUM,0', 7)
+        self.assertEqual(cache.get(key, self.dfs, 100), ('LIST|SUM,0', 7))
+        self.assertEqual(cache.get(key, self.bottom_up, 100), ('LIST|SUM,0', [3, 4]))
+        cache.close()
@@ -39,6 +39,40 @@ class TestConstraint(unittest.TestCase):
             constraint.sample(lc)
             self.assertTrue('invalid constraint {}'.format(lc) in context.exception)
 
+    def test_sample_batch(self):
+        rng = np.random.default_rng(0)
+        ic = constraint.IntConstraint(-5, 5)
+        vals = constraint.sample_batch(ic, 100, rng)
+        self.assertEqual(len(vals), 100)
+        self.assertTrue(all(isinstance(x, int) and -5 <= x <= 5 for x in vals))
+        self.assertEqual(constraint.sample_batch(constraint.IntConstraint(3, 3), 2, rng), [3, 3])
+
+        # each list length has its own int constraint
+        ics = [constraint.IntConstraint(10 * l, 10 * l + 5) for l in range(5)]
+        lc = constraint.ListConstraint(1, 4, ics)
+        vals = constraint.sample_batch(lc, 100, rng)
+        self.assertEqual(len(vals), 100)
+        for val in vals:
+            self.assertTrue(1 <= len(val) <= 4)
+            self.assertTrue(all(10 * len(val) <= x <= 10 * len(val) + 5 for x in val))
+
+        lc = constraint.ListConstraint(0, 0, [ic] * 4)
+        self.assertEqual(constraint.sample_batch(lc, 2, rng), [[], []])
+
+        with self.assertRaises(constraint.InvalidConstraintError):
+            constraint.sample_batch(constraint.IntConstraint(1, 0), 2, rng)
+
+    def test_program_rng(self):
+        p = Program.parse('LIST|INT|TAKE,1,0|MAP,*2,2')
+        other = Program.parse('LIST|INT|DROP,1,0|MAP,*2,2')
+        get = lambda program, seed=0: constraint.get_input_output_examples(program,
+            rng=constraint.get_program_rng(program, seed))
+        key = lambda examples: [([x.val for x in inputs], output.val)
+                                for inputs, output in examples]
+        self.assertEqual(key(get(p)), key(get(p)))
+        self.assertNotEqual(key(get(p)), key(get(p, 1)))
+        self.assertNotEqual(key(get(p)), key(get(other)))
+
     def test_map_constraints(self):
         expectedmap = {
             impl.PLUS1: constraint.IntConstraint(-11, 3),
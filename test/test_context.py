@@ -26,5 +26,26 @@ class TestContext(unittest.TestCase):
 
         self.assertEqual(len(ctx.typemap), 4)
 
+    def test_add(self):
+        scores_map = {
+            impl.MAP: 1.,
+            impl.FILTER: .5,
+            impl.TIMES2: 1.,
+        }
+        added = {
+            impl.COUNT: .5,
+            impl.MINUS1: 0.,
+            impl.SORT: 2.,
+        }
+        ctx = Context(scores_map).add(added)
+        merged = dict(scores_map)
+        merged.update(added)
+        expected = Context(merged)
+
+        self.assertEqual(ctx.items, expected.items)
+        self.assertEqual(ctx.functions, expected.functions)
+        self.assertEqual(dict(ctx.typemap), dict(expected.typemap))
+        self.assertEqual(ctx.scores_map, expected.scores_map)
+
 if __name__ == '__main__':
     unittest.main()
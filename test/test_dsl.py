@@ -2,7 +2,7 @@ import unittest
 
 
 from deepcoder.dsl import impl
-from deepcoder.dsl.function import Function
+from deepcoder.dsl.function import Function, NullInputError, OutputOutOfRangeError
 from deepcoder.dsl.constants import NULL
 from deepcoder.dsl.types import INT, BOOL, LIST, FunctionType
 from deepcoder.dsl.value import IntValue, ListValue, NULLVALUE
@@ -42,6 +42,20 @@ class TestDSL(unittest.TestCase):
         self.assertEqual(impl.ACCESS(IntValue(4), ListValue([1,2,3])), NULLVALUE)
         self.assertEqual(impl.TAKE(IntValue(1), ListValue([])), ListValue([]))
 
+    def test_call_raw(self):
+        self.assertEqual(impl.MAP.call_raw(impl.TIMES2.val, [1,2,3]), [2,4,6])
+        self.assertEqual(impl.SUM.call_raw((1,2,3)), 6)
+        self.assertIsNone(impl.HEAD.call_raw([]))
+        self.assertRaises(NullInputError, impl.SUM.call_raw, None)
+        self.assertRaises(OutputOutOfRangeError, impl.TIMES4.call_raw, 100)
+        self.assertRaises(OutputOutOfRangeError, impl.MAP.call_raw, impl.TIMES4.val, [1, 100])
+
+    def test_value(self):
+        self.assertEqual(str(ListValue([1,2])), '[1, 2]')
+        self.assertEqual(hash(ListValue([1,2])), hash(ListValue((1,2))))
+        self.assertEqual(ListValue.construct((1,2)), ListValue((1,2)))
+        self.assertNotEqual(IntValue(1), ListValue([1]))
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+from deepcoder.dsl import equivalence
+from deepcoder.dsl import impl
+from deepcoder.dsl.equivalence import parse_form, parse_key
+
+class TestEquivalence(unittest.TestCase):
+    def setUp(self):
+        functions = [impl.SORT, impl.REVERSE, impl.MAP, impl.ZIPWITH, impl.TIMES2,
+            impl.TIMES4, impl.LPLUS, impl.LMIN]
+        self.table = equivalence.mine(functions, nb_samples=50)
+
+    def test_mine(self):
+        self.assertEqual(self.table[parse_key('SORT,0>1|SORT,1')], [1])
+        # 0 may be a program input, which a program can't return
+        self.assertEqual(self.table[parse_key('REVERSE,0>1|REVERSE,1')],
+            [0, parse_form('ZIPWITH,min,0,0')])
+        self.assertEqual(self.table[parse_key('MAP,*2,0>1|MAP,*2,1')], [parse_form('MAP,*4,0')])
+        self.assertEqual(self.table[parse_key('ZIPWITH,+,1,0')], [parse_form('ZIPWITH,+,0,1')])
+        # the smallest form of an equivalence class is kept
+        self.assertNotIn(parse_key('ZIPWITH,+,0,1'), self.table)
+        self.assertNotIn(parse_key('MAP,*4,0'), self.table)
+        self.assertNotIn(parse_key('SORT,0>1|REVERSE,1'), self.table)
+
+    def test_mine_inner_variable(self):
+        functions = [impl.MAP, impl.ZIPWITH, impl.SORT, impl.TIMESNEG1, impl.LPLUS,
+            impl.LMINUS]
+        table = equivalence.mine(functions, nb_samples=50)
+        # -x0 - x1 is -(x0 + x1) but x1 - -x0 is x1 + x0
+        self.assertNotIn(parse_key('MAP,*-1,0>1|ZIPWITH,-,1,2'), table)
+        self.assertEqual(table[parse_key('MAP,*-1,0>2|ZIPWITH,-,1,2')],
+            [parse_form('ZIPWITH,+,0,1')])
+        self.assertEqual(parse_key('MAP,*-1,0>2|ZIPWITH,-,1,2'),
+            (parse_form('MAP,*-1,0'), parse_form('ZIPWITH,-,1,2'), 2))
+
+        redundant = equivalence.RedundantStmts(table, functions, 2, 5)
+        skipped = redundant.get(((impl.MAP, (impl.TIMESNEG1, 0)), (impl.SORT, (1,))))
+        self.assertNotIn((impl.ZIPWITH, (impl.LMINUS, 2, 3)), skipped)
+        skipped = redundant.get(((impl.SORT, (1,)), (impl.MAP, (impl.TIMESNEG1, 0))))
+        self.assertIn((impl.ZIPWITH, (impl.LMINUS, 2, 3)), skipped)
+
+    def test_mine_defined(self):
+        table = equivalence.mine([impl.MINIMUM, impl.ACCESS], nb_samples=100)
+        # both sides are null unless the minimum is an index of the list
+        self.assertNotIn(parse_key('MINIMUM,0>1|ACCESS,1,2'), table)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'equivalences.json')
+            equivalence.save(self.table, path)
+            self.assertEqual(equivalence.load(path), self.table)
+            self.assertEqual(equivalence.load(os.path.join(tmpdir, 'missing.json')), {})
+
+    def test_redundant_stmts(self):
+        functions = [impl.SORT, impl.MAP, impl.ZIPWITH, impl.TIMES2, impl.LPLUS, impl.LMIN]
+        redundant = equivalence.RedundantStmts(self.table, functions, 1, 4)
+
+        skipped = redundant.get(())
+        self.assertIn((impl.ZIPWITH, (impl.LPLUS, 1, 0)), skipped)
+        self.assertNotIn((impl.ZIPWITH, (impl.LPLUS, 0, 1)), skipped)
+        # a program can't return its input so the identity is only skipped on statements
+        self.assertNotIn((impl.ZIPWITH, (impl.LMIN, 0, 0)), skipped)
+        self.assertIn((impl.ZIPWITH, (impl.LMIN, 1, 1)), skipped)
+
+        skipped = redundant.get(((impl.SORT, (0,)), (impl.MAP, (impl.TIMES2, 0))))
+        self.assertIn((impl.SORT, (1,)), skipped)
+        self.assertNotIn((impl.SORT, (2,)), skipped)
+        # *4 is not in the context
+        self.assertNotIn((impl.MAP, (impl.TIMES2, 2)), skipped)
+
+        functions.append(impl.TIMES4)
+        redundant = equivalence.RedundantStmts(self.table, functions, 1, 4)
+        skipped = redundant.get(((impl.SORT, (0,)), (impl.MAP, (impl.TIMES2, 0))))
+        self.assertIn((impl.MAP, (impl.TIMES2, 2)), skipped)
+
+    def test_table(self):
+        table = equivalence.load()
+        self.assertTrue(table)
+        for key, forms in table.items():
+            self.assertIn(len(key), [1, 3])
+            self.assertTrue(forms)
@@ -0,0 +1,33 @@
+import unittest
+
+from deepcoder.dsl import fingerprint
+from deepcoder.dsl.program import Program
+from deepcoder.dsl.types import INT, LIST
+
+class TestFingerprint(unittest.TestCase):
+    def test_input_bank(self):
+        bank = fingerprint.get_input_bank((LIST, INT))
+        self.assertEqual(len(bank), fingerprint.NB_BANK_INPUTS)
+        for xs, x in bank:
+            self.assertIsInstance(xs, list)
+            self.assertIsInstance(x, int)
+        self.assertEqual(bank, fingerprint.get_input_bank((LIST, INT), seed=0))
+
+    def test_fingerprint(self):
+        get = lambda prefix: fingerprint.get_fingerprint(Program.parse(prefix))
+        self.assertEqual(get('LIST|MAP,*2,0|MAP,*2,1'), get('LIST|MAP,*4,0'))
+        self.assertEqual(get('LIST|SORT,0|REVERSE,1|REVERSE,2'), get('LIST|SORT,0'))
+        self.assertNotEqual(get('LIST|MAP,*2,0'), get('LIST|MAP,*4,0'))
+        self.assertNotEqual(get('LIST|INT|TAKE,1,0'), get('LIST|INT|DROP,1,0'))
+
+    def test_index(self):
+        index = fingerprint.FingerprintIndex()
+        programs = [Program.parse(x) for x in
+                    ['LIST|MAP,*4,0', 'LIST|MAP,*2,0|MAP,*2,1', 'LIST|MAP,*2,0',
+                     'LIST|INT|TAKE,1,0']]
+        for program in programs:
+            index.add(program)
+        self.assertEqual(index.get(programs[0]), programs[:2])
+        self.assertEqual(index.get(Program.parse('LIST|REVERSE,0|MAP,*2,1|REVERSE,2')),
+                         [programs[2]])
+        self.assertEqual(index.get(Program.parse('LIST|INT|DROP,1,0')), [])
@@ -1,8 +1,10 @@
+import pickle
 import unittest
 
 import numpy as np
 
-from deepcoder.dsl.function import OutputOutOfRangeError
+from deepcoder.dsl import impl
+from deepcoder.dsl.function import NullInputError, OutputOutOfRangeError
 from deepcoder.dsl.program import Program, prune, get_unused_indices
 from deepcoder.dsl.value import IntValue, ListValue
 
@@ -17,8 +19,49 @@ class TestProgram(unittest.TestCase):
 
         self.assertEqual(actual, expected)
         self.assertEqual(program.toprefix(), prefix)
+        self.assertEqual(program.call_raw([1, -5, -3, -4, -2, -1, 2, 3], 1), -2)
+        self.assertIsNone(program.call_raw([], 0))
 
 
+    def test_code(self):
+        prefix = 'LIST|INT|FILTER,<0,0|SORT,2|REVERSE,3|ACCESS,1,4'
+        program = Program.parse(prefix)
+
+        filter_op = impl.FUNCTIONS.index(impl.FILTER)
+        lt0_op = impl.FUNCTIONS.index(impl.LT0)
+        self.assertEqual(program.code[:3], (filter_op, ~lt0_op, 0))
+        self.assertEqual(program.stmts[0], (impl.FILTER, (impl.LT0, 0)))
+
+        other = Program.from_code(program.input_types, program.code)
+        self.assertEqual(other, program)
+        self.assertEqual(hash(other), hash(program))
+        self.assertEqual(other.prefix, prefix)
+        self.assertEqual(Program(program.input_types, program.stmts), program)
+        self.assertEqual(pickle.loads(pickle.dumps(program)), program)
+        self.assertNotEqual(program, Program.parse('LIST|INT|FILTER,<0,0|SORT,2'))
+        self.assertNotEqual(program, prefix)
+
+    def test_compile(self):
+        cases = [
+            ('LIST|INT|FILTER,<0,0|SORT,2|REVERSE,3|ACCESS,1,4',
+                [([1, -5, -3, -4, -2, -1, 2, 3], 1), ([], 0), ([-1], 3)]),
+            ('LIST|LIST|ZIPWITH,-,0,1|SCAN1L,max,2|MAP,/2,3|COUNT,ODD,4',
+                [([1, -5, 7, 2], [3, 0, 1]), ([], [2])]),
+            ('LIST|INT|MAP,**2,0|TAKE,1,2',
+                [([7, -8, 6], 2), ([], 1)]),
+        ]
+        for prefix, inputs_list in cases:
+            program = Program.parse(prefix)
+            f = program.compile()
+            self.assertIs(f, Program.parse(prefix).compile())
+            for inputs in inputs_list:
+                self.assertEqual(f(*inputs), program.call_raw(*inputs))
+
+        program = Program.parse('LIST|HEAD,0|MAP,*4,0|ACCESS,1,0')
+        f = program.compile()
+        self.assertRaises(NullInputError, f, [])
+        self.assertRaises(OutputOutOfRangeError, f, [100])
+
     def test_prune(self):
         prefix = 'LIST|INT|MAP,*2,0|FILTER,>0,0|FILTER,<0,2'
         p = Program.parse(prefix)
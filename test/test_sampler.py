@@ -0,0 +1,69 @@
+import collections
+import itertools
+import unittest
+
+import numpy as np
+
+from deepcoder.context import Context
+from deepcoder.dsl import impl
+from deepcoder.dsl.program import Program, get_unused_indices
+from deepcoder.dsl.types import FunctionType, INT, LIST
+from deepcoder.sampler import ProgramSampler, count_programs, sample_programs
+from deepcoder.search import enumerate_programs
+
+def get_ctx():
+    used = [impl.MAP, impl.FILTER, impl.ZIPWITH, impl.TAKE, impl.SUM, impl.REVERSE,
+        impl.GT0, impl.TIMES2, impl.LPLUS]
+    return Context(dict(zip(used, np.ones(len(used)))))
+
+class TestSampler(unittest.TestCase):
+    def test_count(self):
+        ctx = get_ctx()
+
+        def count(input_types, T):
+            # every program with T statements that uses every variable but the last
+            nb = 0
+
+            def helper(types, stmts):
+                nonlocal nb
+                if len(stmts) == T:
+                    nb += not get_unused_indices(Program(input_types, stmts))
+                    return
+                for f in ctx.functions:
+                    argslists = [ctx.typemap[x] if isinstance(x, FunctionType)
+                                 else [i for i, y in enumerate(types) if y == x]
+                                 for x in f.type.input_types]
+                    for args in itertools.product(*argslists):
+                        helper(types + [f.output_type], stmts + [(f, args)])
+            helper(list(input_types), [])
+            return nb
+
+        for T in [1, 2, 3]:
+            sampler = ProgramSampler(ctx, T)
+            for input_types in [[LIST], [LIST, INT], [LIST, LIST]]:
+                self.assertEqual(sampler.count(input_types), count(input_types, T))
+            nb_programs = len(enumerate_programs([[LIST], [LIST, INT]], T, ctx, np.inf, 1))
+            self.assertLessEqual(nb_programs, count_programs([[LIST], [LIST, INT]], T, ctx))
+
+    def test_sample(self):
+        ctx = get_ctx()
+        input_type_combinations = [[LIST], [LIST, INT]]
+        programs = enumerate_programs(input_type_combinations, 2, ctx, np.inf, 1)
+
+        sampler = ProgramSampler(ctx, 2, seed=0)
+        counts = collections.Counter(sampler.sample(input_type_combinations)
+                                     for _ in range(50 * len(programs)))
+        # only and every program enumerate_programs enumerates, about as often
+        self.assertEqual(set(counts), set(programs))
+        self.assertLess(max(counts.values()), 2 * min(counts.values()))
+        self.assertGreater(sampler.nb_rejected, 0)
+
+    def test_sample_programs(self):
+        ctx = get_ctx()
+        input_type_combinations = [[LIST], [LIST, INT]]
+        programs = list(sample_programs(input_type_combinations, 3, ctx, 50, seed=1))
+        self.assertEqual(len(set(programs)), 50)
+        self.assertEqual(programs,
+            list(sample_programs(input_type_combinations, 3, ctx, 50, seed=1)))
+        with self.assertRaises(ValueError):
+            next(sample_programs(input_type_combinations, 1, ctx, 1000))
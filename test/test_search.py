@@ -1,11 +1,20 @@
+import itertools
+import time
 import unittest
 
 import numpy as np
 
+from deepcoder import stats
+from deepcoder.deadline import Deadline
 from deepcoder.dsl import impl
+from deepcoder.dsl.fingerprint import get_fingerprint
+from deepcoder.dsl.program import Program, get_unused_indices
 from deepcoder.dsl.types import INT, LIST
 from deepcoder.dsl.value import IntValue, ListValue
-from deepcoder.search import dfs, enumerate_programs, sort_and_add
+from deepcoder.search import (best_first, bidirectional, bottom_up, dfs, enumerate_programs,
+    enumerate_unit, get_enumeration_units, get_redundant, iterate_programs, iterate_stmts,
+    parallel_dfs,
+    sort_and_add)
 from deepcoder.context import Context
 
 class TestSearch(unittest.TestCase):
@@ -45,6 +54,52 @@ class TestSearch(unittest.TestCase):
         self.assertTrue(nb_steps > 10)
 
 
+    def test_dfs_batched(self):
+        ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
+
+        inputs_list = [
+            [ListValue([1,-2,3,-4,5,-6,7])],
+            [ListValue([2,-1,-3,1])],
+        ]
+        output_list = [
+            ListValue([1,3,15,105]),
+            ListValue([2,2]),
+        ]
+        examples = list(zip(inputs_list, output_list))
+
+        T = 3
+        expected = dfs(examples, T, ctx)
+        actual = dfs(examples, T, ctx, batched=True)
+        self.assertEqual(actual, expected)
+
+    def test_parallel_dfs(self):
+        ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
+
+        inputs_list = [
+            [ListValue([1,-2,3,-4,5,-6,7])],
+            [ListValue([2,-1,-3,1])],
+        ]
+        output_list = [
+            ListValue([1,3,15,105]),
+            ListValue([2,2]),
+        ]
+        examples = list(zip(inputs_list, output_list))
+
+        T = 3
+        expected, _ = dfs(examples, T, ctx)
+        solution, nb_steps, is_dfs_solution = parallel_dfs(examples, T, ctx, nb_workers=2)
+        self.assertEqual(solution.prefix, expected.prefix)
+        self.assertTrue(is_dfs_solution)
+
+    def test_parallel_dfs_gas(self):
+        ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
+        examples = [([ListValue(list(range(6)))], ListValue([2,3,5,7,11,13]))]
+        solution, nb_steps, is_dfs_solution = parallel_dfs(examples, 3, ctx, gas=100,
+            nb_workers=2, chunk_size=10)
+        self.assertFalse(solution)
+        self.assertEqual(nb_steps, 100)
+        self.assertFalse(is_dfs_solution)
+
     def test_impossible(self):
         """Return the first n primes which is impossible in this language."""
         ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
@@ -59,8 +114,183 @@ class TestSearch(unittest.TestCase):
         T = 2
         solution, nb_steps = dfs(examples, T, ctx)
         self.assertFalse(solution)
-        self.assertTrue(nb_steps > 2000)
+        self.assertTrue(nb_steps > 500)
+
+    def test_deadline(self):
+        ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
+        examples = [([ListValue(list(range(6)))], ListValue([2,3,5,7,11,13]))]
+
+        deadline = Deadline(timeout_ms=50)
+        start = time.time()
+        solution, nb_steps = dfs(examples, 4, ctx, deadline=deadline)
+        self.assertFalse(solution)
+        self.assertTrue(deadline.timed_out)
+        self.assertFalse(deadline.cancelled)
+        self.assertTrue(time.time() - start < 1)
+
+        deadline = Deadline(timeout_ms=50)
+        solution, _, is_dfs_solution = parallel_dfs(examples, 4, ctx, deadline=deadline)
+        self.assertFalse(solution)
+        self.assertFalse(is_dfs_solution)
+        self.assertTrue(deadline.timed_out)
+
+        # the first check stops a cancelled search
+        for search in [dfs, sort_and_add, bottom_up, best_first, bidirectional]:
+            deadline = Deadline()
+            deadline.cancel()
+            solution, nb_steps = search(examples, 4, ctx, deadline=deadline)
+            self.assertFalse(solution)
+            self.assertTrue(np.sum(nb_steps) <= 2)
+            self.assertTrue(deadline.cancelled)
+            self.assertFalse(deadline.timed_out)
+
+    def test_dfs_goal_directed(self):
+        ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
+
+        inputs_list = [
+            [ListValue([1,-2,3,-4,5,-6,7])],
+            [ListValue([2,-1,-3,1])],
+        ]
+        output_list = [
+            IntValue(105),
+            IntValue(2),
+        ]
+        examples = list(zip(inputs_list, output_list))
+
+        search_stats = stats.SearchStats()
+        solution, nb_steps = dfs(examples, 3, ctx, stats=search_stats)
+        for inputs, output in examples:
+            self.assertEqual(solution(*inputs), output)
+        self.assertFalse(get_unused_indices(solution))
+        self.assertEqual(solution.output_type, INT)
+        self.assertTrue(search_stats.prunes[stats.UNUSED] > 0)
+
+        # with list outputs only list functions are tried last
+        solution, nb_steps = dfs([([ListValue([1,2])], ListValue([7,7,7]))], 1, ctx)
+        self.assertFalse(solution)
+        stmts = list(iterate_stmts([LIST], (), ctx, redundant=get_redundant(ctx, 1, 1)))
+        self.assertEqual(nb_steps, 1 + len([f for f, _ in stmts if f.output_type == LIST]))
+
+
+    def test_bottom_up(self):
+        ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
+
+        inputs_list = [
+            [ListValue([1,-2,3,-4,5,-6,7])],
+            [ListValue([2,-1,-3,1])],
+        ]
+        output_list = [
+            ListValue([1,3,15,105]),
+            ListValue([2,2]),
+        ]
+        examples = list(zip(inputs_list, output_list))
+
+        T = 3
+        solution, nb_steps = bottom_up(examples, T, ctx)
+        for inputs, output in examples:
+            self.assertEqual(solution(*inputs), output)
+
+        # same search without merging equivalent programs explores more nodes
+        _, dfs_nb_steps = dfs(examples, T, ctx)
+        self.assertTrue(nb_steps < dfs_nb_steps)
+
+    def test_bottom_up_shared_statements(self):
+        ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
+        program = Program.parse('LIST|SCAN1L,*,0|COUNT,EVEN,1|DROP,2,1')
+        inputs_list = [
+            [ListValue([0,-1,1,1,1,1,0])],
+            [ListValue([0,0,-1,0,0,-1,-1,0,-1,0,-1,0,-1,-1,-1,0,-1,0,-1])],
+            [ListValue([0,0,0,0,0,0,0,-1,-1,0,0,0,-1,0,-1])],
+            [ListValue([-45])],
+            [ListValue([1,2,1,-3,2])],
+        ]
+        examples = [(inputs, program(*inputs)) for inputs in inputs_list]
+
+        # COUNT,EVEN,1 has the values of an earlier program that shares no statement
+        # with SCAN1L,*,0, so only it fits in T
+        solution, _ = bottom_up(examples, 3, ctx)
+        self.assertTrue(solution)
+        for inputs, output in examples:
+            self.assertEqual(solution(*inputs), output)
+
+    def test_bottom_up_gas(self):
+        ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
+        examples = [([ListValue(list(range(6)))], ListValue([2,3,5,7,11,13]))]
+        solution, nb_steps = bottom_up(examples, 2, ctx, gas=100)
+        self.assertFalse(solution)
+        self.assertEqual(nb_steps, 100)
+
+    def test_bidirectional(self):
+        ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
 
+        inputs_list = [
+            [ListValue([1,-2,3,-4,5,-6,7])],
+            [ListValue([2,-1,-3,1,4])],
+        ]
+        output_list = [
+            ListValue([21,36,45,48]),
+            ListValue([12,15,21]),
+        ]
+        examples = list(zip(inputs_list, output_list))
+
+        # the last statements invert to the output of FILTER
+        T = 4
+        solution, nb_steps = bidirectional(examples, T, ctx)
+        for inputs, output in examples:
+            self.assertEqual(solution(*inputs), output)
+        _, dfs_nb_steps = dfs(examples, T, ctx)
+        self.assertTrue(nb_steps < dfs_nb_steps)
+
+        # SORT inverts to any permutation of its output
+        examples = [([ListValue([3,1,2])], ListValue([2,4,6]))]
+        solution, _ = bidirectional(examples, 2, ctx)
+        self.assertEqual(solution.prefix, 'LIST|SORT,0|MAP,*2,1')
+
+        examples = [([ListValue(list(range(6)))], ListValue([2,3,5,7,11,13]))]
+        solution, _ = bidirectional(examples, 2, ctx)
+        self.assertFalse(solution)
+
+    def test_best_first(self):
+        ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
+
+        inputs_list = [
+            [ListValue([1,-2,3,-4,5,-6,7])],
+            [ListValue([2,-1,-3,1])],
+        ]
+        output_list = [
+            ListValue([1,3,15,105]),
+            ListValue([2,2]),
+        ]
+        examples = list(zip(inputs_list, output_list))
+
+        T = 3
+        solution, nb_steps = best_first(examples, T, ctx)
+        for inputs, output in examples:
+            self.assertEqual(solution(*inputs), output)
+
+    def test_best_first_scores(self):
+        """A good low-scoring first statement is expanded before the
+        high-scoring ones are searched to full depth."""
+        scores = dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)) * .01))
+        scores.update({impl.FILTER: .9, impl.GT0: .9, impl.SCAN1L: .9, impl.LTIMES: .9})
+        ctx = Context(scores)
+
+        examples = [([ListValue([1,-2,3,-4,5,-6,7])], ListValue([1,3,15,105]))]
+        T = 3
+        solution, nb_steps = best_first(examples, T, ctx)
+        self.assertEqual(solution.prefix, 'LIST|FILTER,>0,0|SCAN1L,*,1')
+        _, dfs_nb_steps = dfs(examples, T, ctx)
+        self.assertTrue(nb_steps < dfs_nb_steps)
+
+        solution, _ = best_first(examples, T, ctx, beam_width=10)
+        self.assertEqual(solution.prefix, 'LIST|FILTER,>0,0|SCAN1L,*,1')
+
+    def test_best_first_gas(self):
+        ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
+        examples = [([ListValue(list(range(6)))], ListValue([2,3,5,7,11,13]))]
+        solution, nb_steps = best_first(examples, 2, ctx, gas=100)
+        self.assertFalse(solution)
+        self.assertEqual(nb_steps, 100)
 
     def test_enumerate(self):
         used = [impl.MAP, impl.FILTER, impl.COUNT] + [impl.GT0, impl.LT0, impl.EVEN, impl.ODD]
@@ -74,6 +304,60 @@ class TestSearch(unittest.TestCase):
         programs = enumerate_programs(input_type_combinations, T, ctx, 1000)
         self.assertEqual(len(programs), 8)
 
+    def test_enumerate_units(self):
+        used = [impl.MAP, impl.FILTER, impl.COUNT, impl.ZIPWITH, impl.TAKE, impl.GT0,
+            impl.TIMES2, impl.LPLUS]
+        ctx = Context(dict(zip(used, np.ones(len(used)))))
+        input_type_combinations = [[LIST], [LIST, INT]]
+        T = 3
+
+        units = get_enumeration_units(input_type_combinations, T, ctx)
+        self.assertTrue(all(len(stmts) == 2 for _, stmts in units))
+        codes = [code for unit in units for code in enumerate_unit(unit, T, ctx, np.inf)]
+
+        # the same programs in the same order whatever the number of workers
+        for nb_workers in [1, 3]:
+            programs = enumerate_programs(input_type_combinations, T, ctx, 10 ** 6,
+                nb_workers)
+            self.assertEqual([program.code for program in programs], codes)
+        programs = enumerate_programs(input_type_combinations, T, ctx, 100, 3)
+        self.assertEqual([program.code for program in programs], codes[:100])
+
+        # only programs that use every variable are generated
+        self.assertEqual(len(set(codes)), len(codes))
+        for program in programs:
+            self.assertFalse(get_unused_indices(program))
+
+    def test_iterate_programs(self):
+        used = [impl.MAP, impl.FILTER, impl.ZIPWITH, impl.TAKE, impl.GT0, impl.TIMES2,
+            impl.LPLUS]
+        ctx = Context(dict(zip(used, np.ones(len(used)))))
+        input_type_combinations = [[LIST], [LIST, INT]]
+        T = 3
+
+        programs = enumerate_programs(input_type_combinations, T, ctx, 10 ** 6, 2)
+        self.assertEqual(list(iterate_programs(input_type_combinations, T, ctx,
+            nb_workers=2)), programs)
+
+        # programs can be consumed a few at a time and the rest never enumerated
+        it = iterate_programs(input_type_combinations, T, ctx, nb_workers=2)
+        self.assertEqual(list(itertools.islice(it, 10)), programs[:10])
+        it.close()
+
+    def test_enumerate_dedupe(self):
+        used = [impl.MAP, impl.REVERSE, impl.TIMES2, impl.TIMES4]
+        ctx = Context(dict(zip(used, np.ones(len(used)))))
+        prefixes = [program.prefix for program in enumerate_programs([[LIST]], 2, ctx, 100)]
+        self.assertIn('LIST|MAP,*2,0|MAP,*4,1', prefixes)
+        self.assertIn('LIST|MAP,*4,0|MAP,*2,1', prefixes)
+
+        # the first program of each behavior is kept
+        programs = enumerate_programs([[LIST]], 2, ctx, 100, dedupe=True)
+        prefixes = [program.prefix for program in programs]
+        self.assertIn('LIST|MAP,*2,0|MAP,*4,1', prefixes)
+        self.assertNotIn('LIST|MAP,*4,0|MAP,*2,1', prefixes)
+        self.assertEqual(len(set(map(get_fingerprint, programs))), len(programs))
+
     def test_sort_and_add(self):
         score_map = {
             impl.FILTER : .8,
@@ -83,8 +367,8 @@ class TestSearch(unittest.TestCase):
         }
         ctx = Context(score_map)
 
-        # dfs favors more recent inputs
-        actual = 'LIST|FILTER,>0,0|FILTER,>0,1|SCAN1L,*,2'
+        # FILTER,>0 of FILTER,>0 is skipped as equivalent to its input
+        actual = 'LIST|FILTER,>0,0|SCAN1L,*,1'
         inputs_list = [
             [ListValue([1,-2,3,-4,5,-6,7])],
         ]
@@ -97,5 +381,42 @@ class TestSearch(unittest.TestCase):
         self.assertEqual(len(nb_steps_list), 2)
         self.assertEqual(solution.prefix, actual)
 
+    def test_sort_and_add_incremental(self):
+        score_map = {
+            impl.FILTER : .8,
+            impl.LTIMES : .9,
+            impl.SCAN1L : .5,
+            impl.GT0 : 1.,
+            impl.SORT : .3,
+        }
+        ctx = Context(score_map)
+        examples = [([ListValue(list(range(6)))], ListValue([2,3,5,7,11,13]))]
+
+        # each program is only searched in the first context that has its functions
+        T = 2
+        solution, nb_steps_list = sort_and_add(examples, T, ctx)
+        _, nb_steps = dfs(examples, T, ctx)
+        self.assertFalse(solution)
+        self.assertEqual(len(nb_steps_list), 3)
+        self.assertEqual(sum(nb_steps_list), nb_steps)
+
+    def test_dfs_must_use_gas(self):
+        ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
+        examples = [([ListValue([3,1,2])], ListValue([1,2,3]))]
+
+        # programs that don't use must_use aren't steps but still use up the gas
+        search_stats = stats.SearchStats()
+        solution, nb_steps = dfs(examples, 3, ctx, gas=50, stats=search_stats,
+            must_use=set())
+        self.assertIsNone(solution)
+        self.assertEqual(nb_steps, 0)
+        self.assertLessEqual(search_stats.nb_expansions, 50)
+
+        deadline = Deadline(None)
+        deadline.cancel()
+        search_stats = stats.SearchStats()
+        dfs(examples, 3, ctx, stats=search_stats, must_use=set(), deadline=deadline)
+        self.assertLessEqual(search_stats.nb_expansions, 64)
+
 if __name__ == '__main__':
     unittest.main()
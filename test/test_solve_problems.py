@@ -0,0 +1,133 @@
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from deepcoder.cache import SolutionCache
+from deepcoder.dsl import impl
+
+def load_script():
+    """Returns scripts/solve-problems.py as a module."""
+    path = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'solve-problems.py')
+    spec = importlib.util.spec_from_file_location('solve_problems', path)
+    module = importlib.util.module_from_spec(spec)
+    # worker processes find their functions by module name
+    sys.modules['solve_problems'] = module
+    spec.loader.exec_module(module)
+    return module
+
+solve_problems = load_script()
+
+class TestSolveProblems(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_load_results(self):
+        path = os.path.join(self.tmpdir.name, 'results.jsonl')
+        self.assertEqual(solve_problems.load_results(path), [])
+
+        # a line cut off in the middle and a last line without its newline
+        with open(path, 'w') as f:
+            f.write('{"problem": 0}\n{"problem": 1, "nb_st\n{"problem": 2}\n{"problem": 3}')
+        rows = solve_problems.load_results(path)
+        self.assertEqual([row['problem'] for row in rows], [0, 2, 3])
+
+        # rows appended after a resume start on their own line
+        with open(path, 'a') as f:
+            f.write(json.dumps({'problem': 4}) + '\n')
+        rows = solve_problems.load_results(path)
+        self.assertEqual([row['problem'] for row in rows], [0, 2, 3, 4])
+        with open(path) as f:
+            self.assertEqual(f.read().splitlines(),
+                ['{"problem": 0}', '{"problem": 2}', '{"problem": 3}', '{"problem": 4}'])
+
+    def test_estimate_cost(self):
+        problem = {'examples': [{'inputs': [[1, 2], 3], 'output': 3}]}
+        self.assertEqual(solve_problems.estimate_cost(problem), 3.)
+        longer = {'examples': [{'inputs': [[1, 2, 4, 5], 3], 'output': 3}]}
+        self.assertGreater(solve_problems.estimate_cost(longer),
+            solve_problems.estimate_cost(problem))
+
+        # the flatter the predictions, the more functions are tried
+        sharp = np.full(len(impl.FUNCTIONS), 0.01)
+        sharp[:2] = 1.
+        flat = np.ones(len(impl.FUNCTIONS))
+        self.assertLess(solve_problems.estimate_cost(dict(problem, prediction=sharp)),
+            solve_problems.estimate_cost(dict(problem, prediction=flat)))
+
+    def test_get_chunks(self):
+        costs = [8., 4., 2., 1., 1.]
+        self.assertEqual(solve_problems.get_chunks(costs, 2), [[0], [1, 2, 3, 4]])
+
+        # every index once and in order, in chunks of about equal cost
+        costs = [9., 7., 5., 4., 4., 3., 2., 2., 1., 1., 1., 1.]
+        chunks = solve_problems.get_chunks(costs, 4)
+        self.assertEqual(sum(chunks, []), list(range(len(costs))))
+        for chunk in chunks:
+            self.assertTrue(len(chunk) == 1 or sum(costs[i] for i in chunk) <= sum(costs) / 4)
+        self.assertLessEqual(len(chunks), 5)
+
+        self.assertEqual(solve_problems.get_chunks([1.] * 10, 1, max_size=4),
+            [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]])
+
+    def test_split(self):
+        problems = [
+            {'program': 'LIST|SUM,0',
+             'examples': [{'inputs': [[1, 2, 3]], 'output': 6}]},
+            {'program': 'LIST|MAXIMUM,0',
+             'examples': [{'inputs': [[1, 5, 3]], 'output': 5}]},
+            {'program': 'LIST|MINIMUM,0',
+             'examples': [{'inputs': [[1, 5, 3]], 'output': 1}]},
+        ]
+        reruns = []
+
+        def solve_problem(problem, T, mode='dfs', gas=np.inf, beam_width=1000,
+                collect_stats=False, timeout_ms=None):
+            # (solution, walltime, steps_used, is_dfs_solution, stats, timed_out,
+            # exhausted)
+            program = problem['program']
+            if mode == 'dfs':
+                # the MINIMUM problem spends all of its time before the split
+                walltime = 1.2 if program == 'LIST|MINIMUM,0' else 0.3
+                return None, walltime, 10, None, None, True, False
+            reruns.append((program, timeout_ms))
+            if program == 'LIST|SUM,0':
+                return program, 0.2, 5, False, None, False, False
+            return None, 0.2, 100, True, None, False, True
+
+        cache = SolutionCache(os.path.join(self.tmpdir.name, 'cache.sqlite'))
+        with mock.patch.object(solve_problems, 'solve_problem', solve_problem):
+            rows = list(solve_problems.solve_problems(problems, 1, 'dfs', gas=1000,
+                cache=cache, timeout_ms=1000, nb_workers=1, split_after_ms=100))
+        rows = {row['problem']: row for row in rows}
+
+        # the rerun gets what is left of the timeout and its row counts both searches
+        self.assertEqual(sorted(reruns), [('LIST|MAXIMUM,0', 700.), ('LIST|SUM,0', 700.)])
+        self.assertEqual(rows[0]['solution'], 'LIST|SUM,0')
+        self.assertTrue(rows[0]['split'])
+        self.assertAlmostEqual(rows[0]['wall_ms'], 500.)
+        self.assertFalse(rows[2]['split'])
+        self.assertTrue(rows[2]['timed_out'])
+
+        # reruns are cached as parallel-dfs, whose failures don't answer dfs
+        for i, solution, nb_steps in [(0, 'LIST|SUM,0', 5), (1, None, 100)]:
+            examples_key, dfs_key = solve_problems.get_problem_key(problems[i], 1,
+                'dfs', 1000)
+            _, parallel_dfs_key = solve_problems.get_problem_key(problems[i], 1,
+                'parallel-dfs', 1000)
+            self.assertEqual(cache.get(examples_key, parallel_dfs_key, 1000),
+                (solution, nb_steps))
+            self.assertEqual(cache.get(examples_key, dfs_key, 1000),
+                (solution, None) if solution else None)
+        # a failure that timed out isn't cached
+        self.assertIsNone(cache.get(*solve_problems.get_problem_key(problems[2], 1,
+            'dfs', 1000), 1000))
+        cache.close()
@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+
+from deepcoder import stats
+from deepcoder.context import Context
+from deepcoder.dsl import impl
+from deepcoder.dsl.value import ListValue
+from deepcoder.search import best_first, bottom_up, dfs
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        self.ctx = Context(dict(zip(impl.FUNCTIONS, np.ones(len(impl.FUNCTIONS)))))
+        self.examples = [
+            ([ListValue([1,-2,3,-4,5,-6,7])], ListValue([1,3,15,105])),
+            ([ListValue([2,-1,-3,1])], ListValue([2,2])),
+        ]
+
+    def test_dfs(self):
+        search_stats = stats.SearchStats()
+        expected = dfs(self.examples, 3, self.ctx)
+        actual = dfs(self.examples, 3, self.ctx, stats=search_stats)
+        self.assertEqual(actual, expected)
+
+        self.assertTrue(search_stats.nb_expansions > 0)
+        self.assertTrue(search_stats.prunes[stats.DUPLICATE] > 0)
+        self.assertTrue(search_stats.prunes[stats.OUT_OF_RANGE] > 0)
+        self.assertTrue(search_stats.evaluations[impl.SCAN1L] > 0)
+        self.assertTrue(search_stats.evaluations[impl.LTIMES] > 0)
+        self.assertEqual(set(search_stats.depth_times), {1, 2, 3})
+
+    def test_modes(self):
+        for search_func in [best_first, bottom_up]:
+            search_stats = stats.SearchStats()
+            expected = search_func(self.examples, 3, self.ctx)
+            actual = search_func(self.examples, 3, self.ctx, stats=search_stats)
+            self.assertEqual(actual[1], expected[1])
+            self.assertTrue(search_stats.nb_expansions > 0)
+            self.assertTrue(sum(search_stats.evaluations.values()) > 0)
+
+    def test_merge(self):
+        a = stats.SearchStats()
+        dfs(self.examples, 2, self.ctx, stats=a)
+        b = stats.SearchStats()
+        b.merge(a)
+        b.merge(a)
+        row = b.to_dict()
+        self.assertEqual(row['nb_expansions'], 2 * a.nb_expansions)
+        self.assertEqual(row['eval_SCAN1L'], 2 * a.evaluations[impl.SCAN1L])
+        self.assertEqual(row['prune_duplicate'], 2 * a.prunes[stats.DUPLICATE])
+
+if __name__ == '__main__':
+    unittest.main()